@@ -5,7 +5,11 @@ Songs API endpoints for Vibify
 from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
+import asyncio
+import logging
+import time
 import requests
+from urllib.parse import urlsplit
 from ..services.song_service import SongService
 from ..models.song import Song, SongResponse, SongSearchParams
 from ..utils.b2_client import B2Client
@@ -15,6 +19,13 @@ logger = get_logger(__name__)
 
 router = APIRouter(prefix="/api/songs", tags=["songs"])
 
+# Bytes per chunk when relaying song downloads from B2
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Limits for /discover/batch: pages per call, and how far apart the cursors may be (rows fetched in one query)
+MAX_BATCH_CURSORS = 5
+MAX_BATCH_SPAN = 500
+
 @router.get("/test")
 async def test_endpoint():
     """Test endpoint to verify API is working"""
@@ -92,13 +103,13 @@ async def get_random_songs(
         song_service = SongService()
         songs = song_service.get_random_songs(limit=limit)
         
-        # Debug logging
-        if songs:
+        # Debug logging (skipped entirely unless debug is enabled, it sits on the request path)
+        if songs and logger.isEnabledFor(logging.DEBUG):
             song = songs[0]
-            logger.info(f"DEBUG: Song {song.title} - Storage URL: {song.storage_url}")
-            logger.info(f"DEBUG: Song {song.title} - Thumbnail URL: {song.thumbnail_url}")
-            logger.info(f"DEBUG: Storage URL has auth token: {'Authorization=' in song.storage_url}")
-            logger.info(f"DEBUG: Thumbnail URL has auth token: {'Authorization=' in song.thumbnail_url}")
+            logger.debug(f"Song {song.title} - Storage URL: {song.storage_url}")
+            logger.debug(f"Song {song.title} - Thumbnail URL: {song.thumbnail_url}")
+            logger.debug(f"Storage URL has auth token: {'Authorization=' in urlsplit(song.storage_url).query}")
+            logger.debug(f"Thumbnail URL has auth token: {'Authorization=' in urlsplit(song.thumbnail_url).query}")
         
         return songs
     except Exception as e:
@@ -151,6 +162,35 @@ async def discover_songs_by_genre(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching genre-filtered discover feed: {str(e)}")
 
+@router.get("/discover/batch")
+async def discover_songs_batch(
+    response: Response,
+    cursors: str = Query(..., description="Comma-separated feed cursor positions, one per page"),
+    limit: int = Query(20, ge=1, le=100, description="Number of songs to return per page"),
+    seed: int = Query(0, description="Deterministic seed for traversal")
+):
+    """Several discover feed pages in one request and one database query."""
+    try:
+        cursor_list = [int(cursor) for cursor in cursors.split(',') if cursor.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursors must be comma-separated integers")
+    if not cursor_list or any(cursor < 0 for cursor in cursor_list):
+        raise HTTPException(status_code=400, detail="At least one non-negative cursor must be specified")
+    if len(cursor_list) > MAX_BATCH_CURSORS:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_BATCH_CURSORS} cursors allowed")
+    if max(cursor_list) - min(cursor_list) > MAX_BATCH_SPAN:
+        raise HTTPException(status_code=400, detail=f"Cursors must lie within {MAX_BATCH_SPAN} positions of each other")
+    
+    try:
+        start_time = time.perf_counter()
+        song_service = SongService()
+        result = song_service.get_discover_feed_pages(cursors=cursor_list, limit=limit, seed=seed)
+        response.headers["X-Process-Time-Per-Page"] = str((time.perf_counter() - start_time) / len(cursor_list))
+        return result
+    except Exception as e:
+        logger.error(f"Discover batch API error: {e}")
+        raise HTTPException(status_code=500, detail=f"Error fetching discover feed pages: {str(e)}")
+
 @router.post("/{song_id}/stream")
 async def record_song_stream(
     song_id: str,
@@ -264,8 +304,11 @@ async def get_song_urls(song_id: str):
 async def validate_song_files(song_id: str):
     """Validate if song files exist in B2"""
     song_service = SongService()
-    audio_exists = song_service.validate_file_exists(song_id, "audio")
-    thumbnail_exists = song_service.validate_file_exists(song_id, "thumbnail")
+    # Independent HEAD requests, run them side by side
+    audio_exists, thumbnail_exists = await asyncio.gather(
+        asyncio.to_thread(song_service.validate_file_exists, song_id, "audio"),
+        asyncio.to_thread(song_service.validate_file_exists, song_id, "thumbnail")
+    )
     
     return {
         "song_id": song_id,
@@ -363,18 +406,27 @@ async def download_song(song_id: str):
         if not storage_url:
             raise HTTPException(status_code=404, detail="Song file not found")
         
-        # Use httpx to fetch the file from Backblaze B2
+        # Use httpx to stream the file from Backblaze B2 without buffering it in memory
         import httpx
-        async with httpx.AsyncClient() as client:
-            response = await client.get(storage_url)
-            if response.status_code != 200:
-                raise HTTPException(status_code=404, detail="Song file not accessible")
+        client = httpx.AsyncClient()
+        response = await client.send(client.build_request("GET", storage_url), stream=True)
+        if response.status_code != 200:
+            await response.aclose()
+            await client.aclose()
+            raise HTTPException(status_code=404, detail="Song file not accessible")
+        
+        async def stream_file():
+            try:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                await response.aclose()
+                await client.aclose()
         
         # Return the file with proper headers for download
-        from fastapi.responses import Response
         filename = f"{song_details.artist} - {song_details.title}.mp3"
-        return Response(
-            content=response.content,
+        return StreamingResponse(
+            stream_file(),
             media_type="audio/mpeg",
             headers={
                 "Content-Disposition": f"attachment; filename=\"{filename}\"",
@@ -402,9 +454,9 @@ async def get_song_audio(song_id: str):
         b2_client = B2Client()
         b2_client._ensure_authenticated()
         
-        # Proxy request to B2 with auth headers
+        # Proxy request to B2 with auth headers (off the event loop, the connect + headers wait is blocking)
         headers = {'Authorization': b2_client._auth_token}
-        response = requests.get(b2_url, headers=headers, stream=True)
+        response = await asyncio.to_thread(requests.get, b2_url, headers=headers, stream=True)
         
         if response.status_code != 200:
             raise HTTPException(status_code=404, detail="Audio file not found")
@@ -442,9 +494,9 @@ async def get_song_thumbnail(song_id: str):
         b2_client = B2Client()
         b2_client._ensure_authenticated()
         
-        # Proxy request to B2 with auth headers
+        # Proxy request to B2 with auth headers (off the event loop, the connect + headers wait is blocking)
         headers = {'Authorization': b2_client._auth_token}
-        response = requests.get(b2_url, headers=headers, stream=True)
+        response = await asyncio.to_thread(requests.get, b2_url, headers=headers, stream=True)
         
         if response.status_code != 200:
             raise HTTPException(status_code=404, detail="Thumbnail not found")
@@ -7,8 +7,12 @@ This file contains all the constant values used across the application
 # UPLOAD & PROCESSING CONSTANTS
 # ===========================================
 BATCH_SIZE = 50
+MAX_CONCURRENT_BATCHES = 4  # batch upserts in flight at once; gains flatten beyond a few
 MAXIMUM_RETRIES = 3
-RETRY_DELAY = 5  # seconds
+RETRY_DELAY = 5  # seconds, base of the exponential backoff
+RETRY_MAX_DELAY = 30  # seconds, cap of a single backoff sleep
+CIRCUIT_FAIL_THRESHOLD = 5  # requests failing even after retries before uploads fail fast
+CIRCUIT_RESET_TIMEOUT = 60  # seconds to fail fast before probing the service again
 INDEX_FILE = "supabase_upload_index.json"
 
 # ===========================================
@@ -23,12 +27,12 @@ THUMBNAIL_FOLDER_NAME = "thumbnails"
 # ===========================================
 # DATABASE CONSTANTS
 # ===========================================
-VALID_COLUMNS = {
+VALID_COLUMNS = frozenset({
     "id", "title", "artist", "album", "duration", "release_date", 
     "view_count", "like_count", "streams", "description", "youtube_url", 
     "youtube_id", "storage_url", "thumbnail_url", "created_at", 
     "updated_at", "tags"
-}
+})
 
 # ===========================================
 # METADATA FIELD MAPPING
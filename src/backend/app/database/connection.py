@@ -2,10 +2,21 @@
 Supabase database connection for Vibify
 """
 
+import socket
+import httpx
 from supabase import create_client, Client
 from typing import Optional
 from ..config.simple_config import Config
 
+# Connection pool shared by every PostgREST call in the process
+# HTTP/2 multiplexes concurrent requests, so a few connections go a long way
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+HTTP_RETRIES = 3  # Connection-level retries (connect errors only, never replays a request)
+
+# Small genre/song lookups should not wait on Nagle's algorithm
+HTTP_SOCKET_OPTIONS = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+
 class SupabaseClient:
     _instance = None
     _initialized = False
@@ -26,8 +37,28 @@ class SupabaseClient:
             raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set")
         
         self.client: Client = create_client(self.url, self.key)
+        self._configure_connection_pool()
         self._initialized = True
     
+    def _configure_connection_pool(self) -> None:
+        """Swap the PostgREST session for a pooled HTTP/2 one"""
+        postgrest = self.client.postgrest
+        default_session = postgrest.session
+        transport = httpx.HTTPTransport(
+            http2=True,
+            limits=HTTP_LIMITS,
+            retries=HTTP_RETRIES,
+            socket_options=HTTP_SOCKET_OPTIONS
+        )
+        postgrest.session = httpx.Client(
+            base_url=default_session.base_url,
+            headers=default_session.headers,
+            timeout=HTTP_TIMEOUT,
+            transport=transport,
+            follow_redirects=True
+        )
+        default_session.close()
+    
     def get_client(self) -> Client:
         """Get the Supabase client instance"""
         return self.client
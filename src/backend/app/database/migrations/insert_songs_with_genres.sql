@@ -0,0 +1,55 @@
+-- RPC function to upsert a batch of songs and their genre links in one call
+-- songs: JSON array of song rows, genre_ids: JSON array of genre id arrays (same order as songs)
+-- Runs as a single transaction, so a failing batch leaves no half-linked songs behind
+CREATE OR REPLACE FUNCTION public.insert_songs_with_genres(songs JSONB, genre_ids JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    stored_count INTEGER;
+BEGIN
+    -- Upsert the songs
+    INSERT INTO public.songs (
+        id, title, artist, album, duration, release_date, view_count, like_count,
+        description, youtube_url, storage_url, thumbnail_url, is_public, created_at
+    )
+    SELECT
+        id, title, artist, album, duration, release_date, view_count, like_count,
+        description, youtube_url, storage_url, thumbnail_url, is_public, created_at
+    FROM jsonb_populate_recordset(NULL::public.songs, songs)
+    -- Re-uploads refresh the metadata only: counters are left alone, and the B2 URLs set by
+    -- upload_complete and the original created_at (the discover feed's order) are kept
+    ON CONFLICT (id) DO UPDATE SET
+        title = EXCLUDED.title,
+        artist = EXCLUDED.artist,
+        album = EXCLUDED.album,
+        duration = EXCLUDED.duration,
+        release_date = EXCLUDED.release_date,
+        description = EXCLUDED.description,
+        youtube_url = EXCLUDED.youtube_url,
+        storage_url = COALESCE(songs.storage_url, EXCLUDED.storage_url),
+        thumbnail_url = COALESCE(songs.thumbnail_url, EXCLUDED.thumbnail_url),
+        is_public = EXCLUDED.is_public,
+        created_at = COALESCE(songs.created_at, EXCLUDED.created_at);
+
+    GET DIAGNOSTICS stored_count = ROW_COUNT;
+
+    -- Replace the batch's genre links, so re-uploaded songs drop genres they no longer have
+    DELETE FROM public.song_genres
+    WHERE song_id IN (SELECT s.song->>'id' FROM jsonb_array_elements(songs) AS s(song));
+
+    -- Link each song to its genres, pairing the two arrays by position
+    INSERT INTO public.song_genres (song_id, genre_id)
+    SELECT s.song->>'id', g.genre_id::INTEGER
+    FROM jsonb_array_elements(songs) WITH ORDINALITY AS s(song, idx)
+    JOIN jsonb_array_elements(genre_ids) WITH ORDINALITY AS ids(genre_list, idx) USING (idx)
+    CROSS JOIN LATERAL jsonb_array_elements_text(ids.genre_list) AS g(genre_id)
+    ON CONFLICT DO NOTHING;
+
+    RETURN stored_count;
+END;
+$$;
+
+-- SECURITY DEFINER bypasses RLS, so only the service role may call it (not the public anon key)
+REVOKE EXECUTE ON FUNCTION public.insert_songs_with_genres(JSONB, JSONB) FROM PUBLIC, anon, authenticated;
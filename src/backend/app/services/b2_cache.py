@@ -0,0 +1,66 @@
+"""
+Local cache of object keys known to exist in B2.
+Lets upload scripts skip both the upload and the HEAD request for files
+that an earlier run already put in the bucket.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+from app.config.logging_global import get_logger
+from app.utils.b2_client import B2Client
+
+logger = get_logger(__name__)
+
+B2_KEY_CACHE_FILE = Path(".cache/b2_keys.sqlite3")
+
+
+class B2KeyCache:
+    """SQLite-backed set of B2 keys, safe to share between upload threads."""
+
+    def __init__(self, db_path: Path = B2_KEY_CACHE_FILE):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS known_keys (key TEXT PRIMARY KEY, added_at REAL)")
+        self.conn.commit()
+        self._keys = {key for (key,) in self.conn.execute("SELECT key FROM known_keys")}
+
+    def has(self, key: str) -> bool:
+        return key in self._keys
+
+    def add(self, key: str) -> None:
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO known_keys (key, added_at) VALUES (?, ?)", (key, time.time()))
+            self.conn.commit()
+            self._keys.add(key)
+
+    def ensure_uploaded(self, b2_client: B2Client, folder: str, filename: str,
+                        upload: Callable[[], None]) -> bool:
+        """
+        Upload a file unless it is already in the bucket.
+
+        Args:
+            b2_client: Client used for the HEAD pre-check
+            folder: B2 folder of the object
+            filename: Object name inside the folder
+            upload: Performs the actual upload when the object is missing
+
+        Returns:
+            True if the file was uploaded now, False if it was already present
+        """
+        key = f"{folder}/{filename}"
+        if self.has(key):
+            return False
+
+        if not b2_client.file_exists(folder, filename):
+            upload()
+            self.add(key)
+            return True
+
+        logger.debug(f"{key} already in B2, caching")
+        self.add(key)
+        return False
@@ -0,0 +1,110 @@
+"""
+Local cache of the genres table for upload scripts.
+The genres table rarely changes, so the name -> id map is kept on disk and
+only refreshed when the table's row count or highest id changes.
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+import orjson
+from supabase import Client
+
+from app.config.logging_global import get_logger
+
+logger = get_logger(__name__)
+
+GENRE_CACHE_FILE = Path(".cache/genres.json")
+GENRE_PAGE_SIZE = 1000  # PostgREST default max rows per response
+
+
+class GenreCache:
+    """Genre name -> id map persisted between runs."""
+
+    def __init__(self, cache_file: Path = GENRE_CACHE_FILE):
+        self.cache_file = cache_file
+        self._genre_ids: Optional[Dict[str, int]] = None
+        # Upload batches share the cache across threads; genres added since the last save
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def _fetch_etag(self, supabase: Client) -> str:
+        """Fingerprint the genres table as '<row count>:<highest id>' in one round-trip."""
+        result = supabase.table("genres").select("id", count="exact").order("id", desc=True).limit(1).execute()
+        max_id = result.data[0]["id"] if result.data else 0
+        return f"{result.count}:{max_id}"
+
+    def _fetch_all(self, supabase: Client) -> Dict[str, int]:
+        """Load the full genres table, page by page."""
+        genre_ids = {}
+        start = 0
+        while True:
+            result = supabase.table("genres").select("id, name").order("id").range(start, start + GENRE_PAGE_SIZE - 1).execute()
+            genre_ids.update({genre["name"]: genre["id"] for genre in result.data})
+            if len(result.data) < GENRE_PAGE_SIZE:
+                return genre_ids
+            start += GENRE_PAGE_SIZE
+
+    def _load(self) -> Optional[Dict]:
+        try:
+            with open(self.cache_file, "rb") as f:
+                return orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return None
+
+    def _save(self, etag: str) -> None:
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_file, "wb") as f:
+                f.write(orjson.dumps({"etag": etag, "map": self._genre_ids}))
+        except OSError as e:
+            logger.warning(f"Could not write genre cache {self.cache_file}: {e}")
+
+    def _ensure_loaded(self, supabase: Client) -> Dict[str, int]:
+        """Load the map once, refreshing from Supabase if the table changed (caller holds the lock)."""
+        if self._genre_ids is not None:
+            return self._genre_ids
+
+        etag = self._fetch_etag(supabase)
+        cached = self._load()
+        if cached and cached.get("etag") == etag:
+            self._genre_ids = cached["map"]
+            logger.debug(f"Using cached genres ({len(self._genre_ids)} entries)")
+        else:
+            self._genre_ids = self._fetch_all(supabase)
+            self._save(etag)
+            logger.debug(f"Refreshed genre cache ({len(self._genre_ids)} entries)")
+
+        return self._genre_ids
+
+    def get(self, supabase: Client) -> Dict[str, int]:
+        """
+        Get the genre name -> id map, refreshing from Supabase if the table changed.
+
+        Args:
+            supabase: Supabase client used for the freshness check / refresh
+
+        Returns:
+            Mapping of genre name to genre id
+        """
+        with self._lock:
+            return self._ensure_loaded(supabase)
+
+    def update(self, supabase: Client, genre_ids: Dict[str, int]) -> None:
+        """Merge newly created genres into the in-memory map; call save() to persist them."""
+        if not genre_ids:
+            return
+        with self._lock:
+            self._ensure_loaded(supabase).update(genre_ids)
+            self._dirty = True
+
+    def save(self, supabase: Client) -> None:
+        """Write genres added since the last save to disk, re-stamped with the table's current etag."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._save(self._fetch_etag(supabase))
+            self._dirty = False
+
+# Shared instance for the process
+genre_cache = GenreCache()
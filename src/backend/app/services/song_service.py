@@ -10,9 +10,13 @@ from ..models.song import Song, SongResponse, SongSearchParams
 from ..config.logging_global import get_logger
 from ..config.simple_config import Config
 import os
+import time
 
 logger = get_logger(__name__)
 
+# How long the public song count is trusted before it is re-queried
+SONG_COUNT_TTL_SECONDS = 60.0
+
 class SongService:
     _instance = None
     _initialized = False
@@ -35,6 +39,8 @@ class SongService:
             self.supabase = None
         
         self._current_user_id = None
+        self._song_count: Optional[int] = None
+        self._song_count_expires = 0.0
         self._initialized = True
     
     def set_current_user(self, user_id: str):
@@ -229,6 +235,25 @@ class SongService:
             logger.error(f"Error fetching songs from database: {e}")
             return []
     
+    def get_public_song_count(self) -> int:
+        """
+        Get the number of public songs, cached for SONG_COUNT_TTL_SECONDS
+        
+        Returns:
+            Number of public songs
+        """
+        now = time.monotonic()
+        if self._song_count is None or now >= self._song_count_expires:
+            # Only the count header is needed, not the rows
+            count_response = self.supabase.table('songs').select('id', count='exact').eq('is_public', True).limit(1).execute()
+            self._song_count = count_response.count or 0
+            self._song_count_expires = now + SONG_COUNT_TTL_SECONDS
+        return self._song_count
+    
+    def invalidate_song_count(self):
+        """Drop the cached song count (call after inserting or deleting songs)"""
+        self._song_count = None
+    
     def get_random_songs(self, limit: int = 10) -> List[Song]:
         """
         Get random songs from database
@@ -241,8 +266,7 @@ class SongService:
         """
         try:
             # Get total count first
-            count_response = self.supabase.table('songs').select('*', count='exact').eq('is_public', True).execute()
-            total_count = count_response.count if count_response.count else 0
+            total_count = self.get_public_song_count()
             
             if total_count == 0:
                 return []
@@ -365,19 +389,14 @@ class SongService:
         Get detailed song information including genres
         """
         try:
-            # Get song data
-            song_result = self.supabase.table("songs").select("*").eq("id", song_id).single().execute()
+            # Get song data with its genres embedded through the song_genres FK (one round trip)
+            song_result = self.supabase.table("songs").select("*, song_genres(genres(name))").eq("id", song_id).single().execute()
             
             if not song_result.data:
                 return None
             
             song_data = song_result.data
-            
-            # Get genres for this song
-            genres_result = self.supabase.table("song_genres").select("genres(name)").eq("song_id", song_id).execute()
-            genres = []
-            if genres_result.data:
-                genres = [genre["genres"]["name"] for genre in genres_result.data if genre.get("genres")]
+            genres = [genre["genres"]["name"] for genre in song_data.get("song_genres") or [] if genre.get("genres")]
             
             # Generate URLs for this song
             urls = self.generate_song_urls(song_id=song_data['id'])
@@ -1095,4 +1114,67 @@ class SongService:
             traceback.print_exc()
             return {"songs": [], "next_cursor": cursor, "has_more": False, "seed": seed, "total": 0}
 
+    def get_discover_feed_pages(self, cursors: List[int], limit: int = 20, seed: int = 0) -> Dict[str, Any]:
+        """
+        Return several discover feed pages from a single query.
+        
+        The feed is ordered by created_at, so every requested page lies inside one
+        contiguous range; that range is fetched once and sliced per cursor.
+        
+        Args:
+            cursors: Feed cursor positions, one per page
+            limit: Songs per page
+            seed: Deterministic seed for traversal
+        
+        Returns:
+            Dict with "pages", each shaped like a get_discover_feed result
+        """
+        empty_page = lambda cursor: {"songs": [], "next_cursor": cursor, "has_more": False, "seed": seed, "total": 0}
+        try:
+            if not self.supabase:
+                logger.error("Error: Supabase connection not available")
+                return {"pages": [empty_page(cursor) for cursor in cursors]}
+            
+            start = min(cursors)
+            # One row past the last page tells us whether that page has more
+            end = max(cursors) + limit
+            result = (
+                self.supabase
+                .table('songs')
+                .select('*')
+                .eq('is_public', True)
+                .order('created_at', desc=True)  # Same ordering as get_discover_feed
+                .range(start, end)
+                .execute()
+            )
+            rows = result.data or []
+            
+            # Convert each row once, even when requested pages overlap
+            songs_by_offset: Dict[int, Song] = {}
+            pages = []
+            for cursor in cursors:
+                page_songs: List[Song] = []
+                for offset in range(cursor - start, min(cursor - start + limit, len(rows))):
+                    if offset not in songs_by_offset:
+                        try:
+                            songs_by_offset[offset] = self.process_song_data(rows[offset])
+                        except Exception as song_error:
+                            logger.error(f"Error processing song {rows[offset].get('id', 'unknown')}: {song_error}")
+                            continue
+                    page_songs.append(songs_by_offset[offset])
+                
+                pages.append({
+                    "songs": page_songs,
+                    "next_cursor": cursor + len(page_songs),
+                    "has_more": len(rows) > cursor - start + limit,
+                    "seed": seed,
+                    "total": 0
+                })
+            
+            logger.debug(f"Discover feed: returning {len(pages)} pages for cursors {cursors} from {len(rows)} rows")
+            return {"pages": pages}
+        except Exception as e:
+            logger.error(f"Error fetching discover feed pages: {e}")
+            return {"pages": [empty_page(cursor) for cursor in cursors]}
+
 # No global instance - create instances as needed
@@ -0,0 +1,97 @@
+"""
+Local manifest of uploaded metadata files.
+Records (mtime, size) per JSON file after a successful upload so repeat
+runs can skip files that have not changed without opening them.
+"""
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Tuple, Union
+
+from app.config.logging_global import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE = Path(".cache/upload_manifest.sqlite3")
+
+
+class UploadManifest:
+    """SQLite-backed record of which metadata files were uploaded, and at which mtime/size."""
+
+    def __init__(self, db_path: Path = MANIFEST_FILE):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS uploaded_files (
+                path TEXT PRIMARY KEY,
+                mtime REAL,
+                size INTEGER,
+                song_id TEXT,
+                uploaded_at REAL
+            )
+            """
+        )
+        self.conn.commit()
+
+        # Files skipped by the most recent filter_changed pass
+        self.skipped = 0
+        # (mtime, size) seen by filter_changed for files it let through, reused by record
+        self._pending: Dict[str, Tuple[float, int]] = {}
+
+        # Load everything once; lookups during filtering are then pure dict hits
+        self._entries: Dict[str, Tuple[float, int]] = {
+            path: (mtime, size)
+            for path, mtime, size in self.conn.execute("SELECT path, mtime, size FROM uploaded_files")
+        }
+
+    def filter_changed(self, paths: Iterable[Union[str, Path]]) -> Iterator[Path]:
+        """
+        Lazily keep only files that are new or changed since they were last uploaded.
+
+        Args:
+            paths: Metadata file paths to check (may be a generator)
+
+        Yields:
+            Paths whose (mtime, size) differ from the manifest
+        """
+        self.skipped = 0
+        for path in paths:
+            stat_result = os.stat(path)
+            key = (stat_result.st_mtime, stat_result.st_size)
+            if self._entries.get(os.fspath(path)) == key:
+                self.skipped += 1
+            else:
+                self._pending[os.fspath(path)] = key
+                yield Path(path)
+
+        if self.skipped:
+            logger.info(f"Skipped {self.skipped} unchanged files already in the upload manifest")
+
+    def record(self, uploaded: Iterable[Tuple[Union[str, Path], str]]) -> None:
+        """
+        Mark files as uploaded.
+
+        Files that came through filter_changed are recorded with the (mtime, size) seen
+        before they were read, so an edit made during the upload still counts as a change.
+        
+        Args:
+            uploaded: (metadata file path, song id) pairs that were stored successfully
+        """
+        now = time.time()
+        rows = []
+        for path, song_id in uploaded:
+            key = self._pending.pop(os.fspath(path), None)
+            if key is None:
+                stat_result = os.stat(path)
+                key = (stat_result.st_mtime, stat_result.st_size)
+            rows.append((os.fspath(path), *key, song_id, now))
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO uploaded_files (path, mtime, size, song_id, uploaded_at) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        self.conn.commit()
+        self._entries.update({path: (mtime, size) for path, mtime, size, _, _ in rows})
@@ -4,46 +4,110 @@ This service provides both batch and single song upload functionality.
 """
 
 import os
-import json
-import hashlib
 import logging
+import random
 import requests
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
-from datetime import datetime
-from supabase import create_client, Client
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+from datetime import datetime, timezone
+import orjson
+from supabase import Client
 from tqdm import tqdm
 
 from app.config.simple_config import Config
 from app.config.constants import *
 from app.config.logging_global import get_logger
+from app.database.connection import SupabaseClient
+from app.services.genre_cache import genre_cache
+from app.utils.circuit_breaker import CircuitBreaker, is_transient_error
 
 logger = get_logger(__name__)
 
+# Minimum seconds between throughput log lines during a batch upload
+PROGRESS_LOG_INTERVAL = 1.0
+
+# Threads reading/parsing metadata files ahead of the upload loop (file IO and orjson release the GIL)
+PREPARE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Files read ahead at most, so huge folders aren't all loaded into memory at once
+PREPARE_WINDOW = PREPARE_WORKERS * 8
+
 
 class SongUploadService:
     """Service for uploading song metadata to Supabase."""
     
     def __init__(self):
         """Initialize the upload service with Supabase client."""
-        self.supabase: Client = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+        self.supabase: Client = SupabaseClient().get_client()
         self.stats = {
             "total_files": 0,
             "processed_files": 0,
             "new_songs": 0,
             "updated_songs": 0,
             "skipped_unchanged": 0,
+            "skipped_older": 0,
+            "duplicate_ids": 0,
             "empty_files": 0,
             "json_decode_errors": 0,
             "api_errors": 0,
             "batch_count": 0,
+            "retries": 0,
         }
+        # (metadata file, song id) for every record stored by the last upload_batch_songs run
+        self.uploaded_files: List[Tuple[Path, str]] = []
+        # Batches run on worker threads, so stats updates go through _count
+        self._stats_lock = threading.Lock()
+        # Shared by all batches: a Supabase outage fails the remaining batches fast instead of each retrying
+        self._breaker = CircuitBreaker(CIRCUIT_FAIL_THRESHOLD, CIRCUIT_RESET_TIMEOUT, is_failure=is_transient_error)
+    
+    def _count(self, key: str, n: int = 1) -> None:
+        """Add n to a stats counter (thread-safe)."""
+        with self._stats_lock:
+            self.stats[key] += n
+    
+    def _execute(self, request: Any) -> Any:
+        """
+        Execute a PostgREST request through the circuit breaker, retrying transient failures.
+        
+        Once CIRCUIT_FAIL_THRESHOLD requests in a row failed even after retries, requests raise
+        CircuitOpenError without touching the network until CIRCUIT_RESET_TIMEOUT has passed.
+        
+        Args:
+            request: Built query, e.g. self.supabase.table("songs").upsert(rows)
+            
+        Returns:
+            The request's APIResponse
+        """
+        return self._breaker.call(self._execute_with_retries, request)
+    
+    def _execute_with_retries(self, request: Any) -> Any:
+        """
+        Execute a PostgREST request, retrying transient failures.
+        
+        Sleeps uniform(0, min(RETRY_MAX_DELAY, RETRY_DELAY * 2**attempt)) between attempts
+        (exponential backoff with full jitter), so batches that fail together don't retry
+        in lockstep. Client errors such as constraint violations are raised immediately.
+        """
+        for attempt in range(MAXIMUM_RETRIES + 1):
+            try:
+                return request.execute()
+            except Exception as e:
+                if attempt == MAXIMUM_RETRIES or not is_transient_error(e):
+                    raise
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt))
+                logger.warning(f"Transient Supabase error, retrying in {delay:.1f}s: {e}")
+                self._count("retries")
+                time.sleep(delay)
     
     def format_timestamp(self, dt: Optional[datetime] = None) -> str:
         """Format timestamp in PostgreSQL-compatible ISO format."""
         if dt is None:
-            dt = datetime.utcnow()
-        return dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            dt = datetime.now(timezone.utc)
+        # isoformat is several times cheaper than strftime; same output as "%Y-%m-%dT%H:%M:%S.%fZ"
+        return dt.replace(tzinfo=None).isoformat(timespec="microseconds") + "Z"
     
     def get_b2_url(self, file_id: str, file_type: str) -> str:
         """Generate a presigned URL for a file in the B2 bucket."""
@@ -106,11 +170,11 @@ class SongUploadService:
     
     def sanitize_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Clean up data before inserting into database."""
-        # Convert metadata fields to DB column names
+        # Convert metadata fields to DB column names, dropping fields that don't exist in the schema
         mapped_data = {}
         for key, value in data.items():
             db_key = FIELD_MAPPING.get(key, key)
-            if value is not None:
+            if value is not None and db_key in VALID_COLUMNS:
                 mapped_data[db_key] = value
         
         # Convert release_date from YYYYMMDD to YYYY-MM-DD
@@ -133,60 +197,65 @@ class SongUploadService:
                 logger.warning(f"Missing local files for song {file_id}, skipping upload")
                 return None  # Skip this song entirely
         
-        # Remove any fields that don't exist in the schema
-        sanitized = {k: v for k, v in mapped_data.items() if k in VALID_COLUMNS}
-        
         # Ensure we have timestamp for updated_at
-        if "updated_at" not in sanitized:
-            sanitized["updated_at"] = self.format_timestamp()
+        if "updated_at" not in mapped_data:
+            mapped_data["updated_at"] = self.format_timestamp()
         
-        return sanitized
-    
-    def calculate_file_hash(self, file_path: str) -> str:
-        """Calculate MD5 hash of a file."""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        return mapped_data
     
     def insert_genres(self, song_id: str, genres: List[str]) -> None:
         """Insert genres for a song."""
-        if not genres:
+        self.insert_genres_batch({song_id: genres})
+    
+    def insert_genres_batch(self, genres_by_song: Dict[str, List[str]]) -> None:
+        """
+        Replace the genres of several songs with one delete and one insert.
+        
+        Args:
+            genres_by_song: Genre names per song ID
+        """
+        # Normalize names, dropping empties
+        names_by_song = {}
+        for song_id, genres in genres_by_song.items():
+            genre_names = [name.strip().lower() for name in genres or []]
+            genre_names = [name for name in genre_names if name]
+            if genre_names:
+                names_by_song[song_id] = genre_names
+        
+        if not names_by_song:
             return
         
-        # First, make sure all genres exist in the genres table
-        genre_objects = []
-        for genre_name in genres:
-            genre_name = genre_name.strip().lower()
-            if not genre_name:
-                continue
-            genre_objects.append({"name": genre_name})
-        
-        if genre_objects:
-            # Upsert genres to ensure they exist
-            self.supabase.table("genres").upsert(
-                genre_objects, 
+        # Resolve IDs from the local cache, only unknown genres go to Supabase
+        known_genres = genre_cache.get(self.supabase)
+        all_names = dict.fromkeys(name for names in names_by_song.values() for name in names)
+        genre_ids = {name: known_genres[name] for name in all_names if name in known_genres}
+        missing = [name for name in all_names if name not in genre_ids]
+        
+        if missing:
+            # Upsert genres to ensure they exist; the returned rows carry their IDs
+            genre_results = self._execute(self.supabase.table("genres").upsert(
+                [{"name": name} for name in missing], 
                 on_conflict="name"
-            ).execute()
-            
-            # Get genre IDs for the inserted genre names
-            genre_results = self.supabase.table("genres").select("id, name").in_("name", [obj["name"] for obj in genre_objects]).execute()
-            
-            # Create song_genres relationships
-            song_genre_objects = []
-            for genre_record in genre_results.data:
+            ))
+            new_genres = {genre["name"]: genre["id"] for genre in genre_results.data}
+            genre_cache.update(self.supabase, new_genres)
+            genre_ids.update(new_genres)
+        
+        # Create song_genres relationships
+        song_genre_objects = []
+        for song_id, genre_names in names_by_song.items():
+            for genre_id in dict.fromkeys(genre_ids[name] for name in genre_names if name in genre_ids):
                 song_genre_objects.append({
                     "song_id": song_id,
-                    "genre_id": genre_record["id"]
+                    "genre_id": genre_id
                 })
+        
+        if song_genre_objects:
+            # First delete existing relationships (one statement for the whole batch)
+            self._execute(self.supabase.table("song_genres").delete(returning="minimal").in_("song_id", list(names_by_song)))
             
-            if song_genre_objects:
-                # First delete existing relationships
-                self.supabase.table("song_genres").delete().eq("song_id", song_id).execute()
-                
-                # Then insert new relationships
-                self.supabase.table("song_genres").insert(song_genre_objects).execute()
+            # Then insert new relationships
+            self._execute(self.supabase.table("song_genres").insert(song_genre_objects, returning="minimal"))
     
     def upload_single_song(self, metadata: Dict[str, Any], file_path: Optional[str] = None) -> bool:
         """
@@ -207,10 +276,11 @@ class SongUploadService:
             genres = record_data.pop("tags", [])  # Still reading from "tags" field in JSON
             
             # Insert the song record
-            result = self.supabase.table("songs").upsert(
+            self._execute(self.supabase.table("songs").upsert(
                 record_data,
-                on_conflict="id"
-            ).execute()
+                on_conflict="id",
+                returning="minimal"
+            ))
             
             # Insert genres if any
             if genres:
@@ -224,12 +294,58 @@ class SongUploadService:
             self.stats["api_errors"] += 1
             return False
     
-    def upload_batch_songs(self, metadata_files: List[Path], batch_size: int = 50, show_progress: bool = True, skip_older: bool = False) -> Dict[str, int]:
+    def _prepare_file(self, json_file: Path) -> Tuple[str, Any]:
+        """
+        Read, parse and sanitize one metadata file (runs on a worker thread).
+        
+        Returns:
+            (status, payload): ("ok", record), ("empty", None), ("missing_files", None),
+            ("decode_error", None) or ("error", exception)
+        """
+        try:
+            # Read the file; an empty read means an empty file, no separate stat() needed
+            with open(json_file, "rb") as f:
+                raw = f.read()
+            if not raw:
+                return "empty", None
+            
+            # Parse the JSON file
+            metadata = orjson.loads(raw)
+            
+            # Sanitize the data; None means the local audio/thumbnail files are missing
+            record_data = self.sanitize_data(metadata)
+            if record_data is None:
+                return "missing_files", None
+            return "ok", record_data
+        except orjson.JSONDecodeError:
+            return "decode_error", None
+        except Exception as e:
+            return "error", e
+    
+    def _prepare_files(self, metadata_files: Iterable[Path]) -> Iterator[Tuple[Path, Tuple[str, Any]]]:
+        """Prepare files on a thread pool, yielding results in input order with bounded read-ahead."""
+        from ..utils.b2_client import B2Client
+        
+        # Build the B2 client singleton before the workers race to create it
+        B2Client()
+        
+        with ThreadPoolExecutor(max_workers=PREPARE_WORKERS) as executor:
+            pending = deque()
+            for json_file in metadata_files:
+                pending.append((json_file, executor.submit(self._prepare_file, json_file)))
+                if len(pending) >= PREPARE_WINDOW:
+                    json_file, future = pending.popleft()
+                    yield json_file, future.result()
+            while pending:
+                json_file, future = pending.popleft()
+                yield json_file, future.result()
+    
+    def upload_batch_songs(self, metadata_files: Iterable[Path], batch_size: int = 50, show_progress: bool = True, skip_older: bool = False) -> Dict[str, int]:
         """
         Upload multiple songs in batches with progress tracking.
         
         Args:
-            metadata_files: List of Path objects to JSON metadata files
+            metadata_files: Path objects to JSON metadata files (may be a generator)
             batch_size: Number of records to batch in a single request
             show_progress: Whether to show progress bar
             skip_older: Skip files that are older than existing database records
@@ -239,60 +355,84 @@ class SongUploadService:
         """
         # Reset stats
         self.stats = {
-            "total_files": len(metadata_files),
+            "total_files": 0,
             "processed_files": 0,
             "new_songs": 0,
             "updated_songs": 0,
             "skipped_unchanged": 0,
             "skipped_older": 0,
+            "duplicate_ids": 0,
             "empty_files": 0,
             "json_decode_errors": 0,
             "api_errors": 0,
             "batch_count": 0,
+            "retries": 0,
         }
+        self.uploaded_files = []
         
-        # Process files in batches
+        # Process files in batches; up to MAX_CONCURRENT_BATCHES upserts are in flight at once
         batch_data = []
         batch_file_info = []
+        # Song ids already queued this run: batches run concurrently, so two batches upserting
+        # the same row (and replacing its genres) would race
+        seen_ids = set()
+        batch_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_BATCHES)
+        in_flight = deque()
         
         # Create progress bar
         if show_progress:
-            progress_bar = tqdm(total=len(metadata_files), desc="Uploading songs", unit="songs")
+            progress_bar = tqdm(desc="Uploading songs", unit="songs", mininterval=0.5, smoothing=0.1)
+        
+        # Without a progress bar, report throughput at most once per PROGRESS_LOG_INTERVAL
+        start_time = last_log_time = time.monotonic()
         
         try:
-            for idx, json_file in enumerate(metadata_files):
+            for json_file, (status, payload) in self._prepare_files(metadata_files):
+                self._count("total_files")
+                if not show_progress and time.monotonic() - last_log_time >= PROGRESS_LOG_INTERVAL:
+                    last_log_time = time.monotonic()
+                    rate = self.stats["total_files"] / (last_log_time - start_time)
+                    logger.info(f"Read {self.stats['total_files']} files ({rate:.0f} files/s), uploaded {self.stats['processed_files']} songs")
                 try:
-                    # Check if file is empty
-                    if json_file.stat().st_size == 0:
+                    if status == "empty":
                         logger.warning(f"Empty file: {json_file}")
-                        self.stats["empty_files"] += 1
+                        self._count("empty_files")
                         if show_progress:
                             progress_bar.update(1)
                         continue
                     
-                    # Read and parse the JSON file
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        metadata = json.load(f)
+                    if status == "decode_error":
+                        logger.warning(f"Error decoding JSON: {json_file}")
+                        self._count("json_decode_errors")
+                        if show_progress:
+                            progress_bar.update(1)
+                        continue
                     
-                    # Sanitize the data
-                    record_data = self.sanitize_data(metadata)
+                    if status == "error":
+                        raise payload
                     
                     # Skip if sanitize_data returned None (missing local files)
-                    if record_data is None:
-                        logger.info(f"Skipping {json_file.name} - missing local files")
-                        self.stats["skipped_unchanged"] += 1  # Use this counter for missing files
+                    if status == "missing_files":
+                        logger.debug(f"Skipping {json_file.name} - missing local files")
+                        self._count("skipped_unchanged")  # Use this counter for missing files
                         if show_progress:
                             progress_bar.update(1)
                         continue
                     
-                    # Check if we should skip this file based on age
-                    if skip_older and record_data.get("id"):
-                        if self._should_skip_older_file(json_file, record_data["id"]):
-                            logger.info(f"Skipping older file: {json_file.name}")
-                            self.stats["skipped_older"] += 1
+                    record_data = payload
+                    
+                    # Keep the first file per song id, later ones would race it in another batch
+                    song_id = record_data.get("id")
+                    if song_id:
+                        if song_id in seen_ids:
+                            logger.warning(f"Skipping {json_file.name} - song {song_id} already queued in this run")
+                            self._count("duplicate_ids")
                             if show_progress:
                                 progress_bar.update(1)
                             continue
+                        seen_ids.add(song_id)
+                    
+                    # Files older than their database record are skipped per batch in _process_batch
                     
                     # Extract genres before adding to batch
                     genres = record_data.pop("tags", [])  # Still reading from "tags" field in JSON
@@ -303,7 +443,9 @@ class SongUploadService:
                     
                     # Process the batch if it reaches the batch size
                     if len(batch_data) >= batch_size:
-                        success = self._process_batch(batch_data, batch_file_info)
+                        if len(in_flight) >= MAX_CONCURRENT_BATCHES:
+                            in_flight.popleft().result()
+                        in_flight.append(batch_executor.submit(self._process_batch, batch_data, batch_file_info, skip_older))
                         
                         if show_progress:
                             progress_bar.set_postfix(
@@ -315,133 +457,144 @@ class SongUploadService:
                         batch_data = []
                         batch_file_info = []
                     
-                    self.stats["processed_files"] += 1
                     if show_progress:
                         progress_bar.update(1)
                     
-                except json.JSONDecodeError:
-                    logger.warning(f"Error decoding JSON: {json_file}")
-                    self.stats["json_decode_errors"] += 1
-                    if show_progress:
-                        progress_bar.update(1)
                 except Exception as e:
                     logger.error(f"Error processing {json_file}: {e}")
-                    self.stats["api_errors"] += 1
+                    self._count("api_errors")
                     if show_progress:
                         progress_bar.update(1)
             
             # Process any remaining records in the last batch
             if batch_data:
-                self._process_batch(batch_data, batch_file_info)
+                in_flight.append(batch_executor.submit(self._process_batch, batch_data, batch_file_info, skip_older))
+            for future in in_flight:
+                future.result()
         
         finally:
+            batch_executor.shutdown(wait=True)
+            # Persist genres created by the batches once, not on every update
+            try:
+                genre_cache.save(self.supabase)
+            except Exception as e:
+                logger.warning(f"Could not save genre cache: {e}")
             if show_progress:
                 progress_bar.close()
         
         return self.stats
     
-    def _process_batch(self, batch_data: List[Dict[str, Any]], batch_file_info: List[Tuple]) -> bool:
-        """Process a batch of records."""
+    def _process_batch(self, batch_data: List[Dict[str, Any]], batch_file_info: List[Tuple], skip_older: bool = False) -> bool:
+        """Process a batch of records, optionally dropping files older than their database record."""
         if not batch_data:
             return True
         
         try:
-            # Check for existing songs before upsert
+            # Check for existing songs (and when they were last updated) in one query before upsert
             song_ids = [record.get("id") for record in batch_data if record.get("id")]
-            existing_songs = set()
+            existing_updated_at = {}
             
             if song_ids:
                 try:
-                    result = self.supabase.table("songs").select("id").in_("id", song_ids).execute()
-                    existing_songs = {song["id"] for song in result.data} if result.data else set()
-                    
-                    if existing_songs:
-                        logger.info(f"Found {len(existing_songs)} existing songs that will be updated: {list(existing_songs)[:5]}{'...' if len(existing_songs) > 5 else ''}")
+                    result = self._execute(self.supabase.table("songs").select("id, updated_at").in_("id", song_ids))
+                    existing_updated_at = {song["id"]: song.get("updated_at") for song in result.data or []}
                 except Exception as e:
                     logger.warning(f"Could not check for existing songs: {e}")
             
-            # Clean up batch data for Supabase
-            all_keys = set()
-            for record in batch_data:
-                all_keys.update(record.keys())
-            
-            # Normalize all records to have the same keys
-            for record in batch_data:
-                for key in all_keys:
-                    if key not in record:
-                        record[key] = None
-            
-            # Perform upsert operation
-            result = self.supabase.table("songs").upsert(
+            if skip_older and existing_updated_at:
+                kept = [
+                    (record, file_info)
+                    for record, file_info in zip(batch_data, batch_file_info)
+                    if not self._should_skip_older_file(file_info[0], existing_updated_at.get(record.get("id")))
+                ]
+                skipped = len(batch_data) - len(kept)
+                if skipped:
+                    logger.info(f"Skipping {skipped} files older than their database records")
+                    self._count("skipped_older", skipped)
+                    batch_data = [record for record, _ in kept]
+                    batch_file_info = [file_info for _, file_info in kept]
+                    song_ids = [record.get("id") for record in batch_data if record.get("id")]
+                    if not batch_data:
+                        return True
+            
+            existing_songs = existing_updated_at.keys() & set(song_ids)
+            if existing_songs:
+                logger.info(f"Found {len(existing_songs)} existing songs that will be updated: {list(existing_songs)[:5]}{'...' if len(existing_songs) > 5 else ''}")
+            
+            # Normalize all records to have the same keys (PostgREST bulk upserts require it),
+            # merging each record over a None template in one C-level dict merge
+            template = dict.fromkeys(set().union(*(record.keys() for record in batch_data)))
+            batch_data = [{**template, **record} for record in batch_data]
+            
+            # Perform upsert operation; return=minimal skips echoing the rows back
+            self._execute(self.supabase.table("songs").upsert(
                 batch_data,
-                on_conflict="id"
-            ).execute()
+                on_conflict="id",
+                returning="minimal"
+            ))
             
             # Log the results and update statistics
             new_songs = len(song_ids) - len(existing_songs)
             updated_songs = len(existing_songs)
             
-            self.stats["new_songs"] += new_songs
-            self.stats["updated_songs"] += updated_songs
+            self._count("processed_files", len(batch_data))
+            self._count("new_songs", new_songs)
+            self._count("updated_songs", updated_songs)
             
             if new_songs > 0:
                 logger.info(f"Added {new_songs} new songs")
             if updated_songs > 0:
                 logger.info(f"Updated {updated_songs} existing songs")
             
-            # Process genres for each record
-            for i, record in enumerate(batch_data):
-                if i < len(batch_file_info):
-                    song_id = record.get("id")
-                    if song_id:
-                        _, genres = batch_file_info[i]
-                        if genres:
-                            try:
-                                self.insert_genres(song_id, genres)
-                            except Exception as e:
-                                logger.error(f"Error inserting genres for song {song_id}: {e}")
-            
-            self.stats["batch_count"] += 1
+            uploaded = [
+                (json_file, record["id"])
+                for record, (json_file, _) in zip(batch_data, batch_file_info)
+                if record.get("id")
+            ]
+            with self._stats_lock:
+                self.uploaded_files.extend(uploaded)
+            
+            # Process genres for the whole batch at once
+            genres_by_song = {
+                record["id"]: genres
+                for record, (_, genres) in zip(batch_data, batch_file_info)
+                if record.get("id") and genres
+            }
+            try:
+                self.insert_genres_batch(genres_by_song)
+            except Exception as e:
+                logger.error(f"Error inserting genres for batch of {len(genres_by_song)} songs: {e}")
+            
+            self._count("batch_count")
             logger.debug(f"Processed batch {self.stats['batch_count']} with {len(batch_data)} records")
             return True
             
         except Exception as e:
             logger.error(f"Error processing batch: {e}")
-            self.stats["api_errors"] += 1
+            self._count("api_errors")
             return False
     
-    def _should_skip_older_file(self, file_path: Path, song_id: str) -> bool:
+    def _should_skip_older_file(self, file_path: Path, db_updated_at: Optional[str]) -> bool:
         """
         Check if a file should be skipped because it's older than the database record.
         
         Args:
             file_path: Path to the metadata file
-            song_id: Song ID to check in database
+            db_updated_at: The record's updated_at (ISO format), None if there is no record
             
         Returns:
             True if file should be skipped (older than database), False otherwise
         """
+        if not db_updated_at:
+            # No existing record or no timestamp in database, don't skip
+            return False
+        
         try:
             # Get file modification time
             file_mtime = file_path.stat().st_mtime
             
-            # Get database record's updated_at timestamp
-            result = self.supabase.table("songs").select("updated_at").eq("id", song_id).single().execute()
-            
-            if not result.data:
-                # No existing record, don't skip
-                return False
-            
-            # Convert database timestamp to Unix timestamp
-            db_updated_at = result.data.get("updated_at")
-            if not db_updated_at:
-                # No timestamp in database, don't skip
-                return False
-            
             # Parse database timestamp (ISO format)
-            from datetime import datetime
-            db_timestamp = datetime.fromisoformat(db_updated_at.replace('Z', '+00:00'))
-            db_mtime = db_timestamp.timestamp()
+            db_mtime = datetime.fromisoformat(db_updated_at.replace('Z', '+00:00')).timestamp()
             
             # Skip if file is older than database record
             should_skip = file_mtime <= db_mtime
@@ -452,15 +605,9 @@ class SongUploadService:
             return should_skip
             
         except Exception as e:
-            # Check if it's the "no rows" error (expected when database is empty)
-            if "PGRST116" in str(e) or "0 rows" in str(e):
-                # No existing record, don't skip (this is expected for new uploads)
-                return False
-            else:
-                # Log other errors as warnings
-                logger.warning(f"Error checking file age for {song_id}: {e}")
-                # If we can't determine age, don't skip
-                return False
+            # If we can't determine age, don't skip
+            logger.warning(f"Error checking file age for {file_path.name}: {e}")
+            return False
 
     def get_upload_stats(self) -> Dict[str, int]:
         """Get current upload statistics."""
@@ -476,10 +623,12 @@ class SongUploadService:
         logger.info(f"New songs added: {self.stats['new_songs']}")
         logger.info(f"Existing songs updated: {self.stats['updated_songs']}")
         logger.info(f"Skipped older files: {self.stats['skipped_older']}")
+        logger.info(f"Skipped duplicate song ids: {self.stats['duplicate_ids']}")
         logger.info(f"Skipped missing files: {self.stats['skipped_unchanged']}")
         logger.info(f"Empty files: {self.stats['empty_files']}")
         logger.info(f"JSON decode errors: {self.stats['json_decode_errors']}")
         logger.info(f"API errors: {self.stats['api_errors']}")
+        logger.info(f"Retried requests: {self.stats['retries']}")
         logger.info(f"Batch count: {self.stats['batch_count']}")
         logger.info("="*50)
 
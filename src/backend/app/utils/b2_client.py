@@ -3,11 +3,17 @@ Backblaze B2 Client for Vibify
 Handles file uploads, downloads, and URL generation
 """
 
+import io
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import boto3
+from boto3.s3.transfer import TransferConfig
 from base64 import b64encode
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+from botocore.client import BaseClient
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
 from datetime import datetime, timedelta
 from ..config.logging_global import get_logger
@@ -15,6 +21,50 @@ from ..config.logging_global import get_logger
 # Setup logging
 logger = get_logger(__name__)
 
+# b2_authorize_account responses shared by every B2Client in the process, keyed by credentials
+_AUTH_CACHE: Dict[Tuple[str, str], Tuple[datetime, dict]] = {}
+_AUTH_LOCK = threading.Lock()
+AUTH_EXPIRY_MARGIN = timedelta(seconds=60)  # Re-authorize slightly before the cached token expires
+
+# Pooled S3 transport, sized so several upload thread pools can share it without waiting for a connection
+S3_CLIENT_CONFIG = BotoConfig(
+    max_pool_connections=50,
+    signature_version='s3v4',
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+
+# Multipart uploads for large files: 8MB parts, up to 10 in flight per file
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True
+)
+
+# files_exist: above this many keys one prefix listing beats individual HEAD requests
+FILES_EXIST_LIST_THRESHOLD = 32
+FILES_EXIST_HEAD_WORKERS = 16
+
+# boto3 client creation is expensive (~25ms), so one client is built lazily and shared process-wide
+_S3_CLIENT: Optional[BaseClient] = None
+_S3_CLIENT_LOCK = threading.Lock()
+
+def _get_s3_client(endpoint_url: str, key_id: str, application_key: str) -> BaseClient:
+    """Return the shared S3 client for B2, creating it on first use"""
+    global _S3_CLIENT
+    if _S3_CLIENT is None:
+        with _S3_CLIENT_LOCK:
+            if _S3_CLIENT is None:
+                _S3_CLIENT = boto3.client(
+                    's3',
+                    endpoint_url=endpoint_url,
+                    aws_access_key_id=key_id,
+                    aws_secret_access_key=application_key,
+                    config=S3_CLIENT_CONFIG
+                )
+    return _S3_CLIENT
+
 class B2Client:
     _instance = None
     _initialized = False
@@ -45,22 +95,22 @@ class B2Client:
         self._bucket_id = None
         self._is_authenticated = False
         self._auth_expires_at = None
+        self._audio_url_prefix = None
+        self._thumbnail_url_prefix = None
+        self._url_auth_suffix = None
         self._session = requests.Session()  # Reuse connections
         
-        # Initialize S3 client for B2 (for uploads and presigned URLs)
-        self.s3_client = boto3.client(
-            's3',
-            endpoint_url=self.endpoint_url,
-            aws_access_key_id=self.key_id,
-            aws_secret_access_key=self.application_key
-        )
-        
         # Mark as initialized
         self._initialized = True
         
         # Pre-authenticate on startup
         self._ensure_authenticated()
     
+    @property
+    def s3_client(self) -> BaseClient:
+        """S3 client for B2 (uploads, existence checks, deletes), shared across instances"""
+        return _get_s3_client(self.endpoint_url, self.key_id, self.application_key)
+    
     def _ensure_authenticated(self) -> bool:
         """Ensure we have valid authentication with B2 API (with caching)"""
         # Check if we have a valid cached token
@@ -68,7 +118,39 @@ class B2Client:
             self._auth_expires_at and 
             datetime.now() < self._auth_expires_at):
             return True
+        
+        with _AUTH_LOCK:
+            # Reuse an authorization another client (or thread) already fetched
+            cache_key = (self.key_id, self.application_key)
+            cached = _AUTH_CACHE.get(cache_key)
+            if cached and datetime.now() < cached[0] - AUTH_EXPIRY_MARGIN:
+                expires_at, data = cached
+            else:
+                data = self._authorize_account()
+                # Cache for 23 hours (B2 tokens are valid for 24 hours)
+                expires_at = datetime.now() + timedelta(hours=23)
+                _AUTH_CACHE[cache_key] = (expires_at, data)
+                logger.info("B2 authentication successful and cached")
             
+            self._auth_token = data['authorizationToken']
+            self._download_url = data['downloadUrl']
+            self._bucket_id = self._find_bucket_id(data)
+            
+            if not self._bucket_id:
+                raise Exception(f"Bucket '{self.bucket_name}' not found in allowed buckets")
+            
+            # URLs only vary by filename until the token changes, so build the fixed parts once
+            file_url = f"{self._download_url}/file/{self.bucket_name}"
+            self._audio_url_prefix = f"{file_url}/{self.audio_folder}/"
+            self._thumbnail_url_prefix = f"{file_url}/{self.thumbnail_folder}/"
+            self._url_auth_suffix = f"?Authorization={self._auth_token}"
+            
+            self._auth_expires_at = expires_at
+            self._is_authenticated = True
+            return True
+    
+    def _authorize_account(self) -> dict:
+        """Call b2_authorize_account and return the raw response"""
         try:
             # Prepare authentication
             auth_string = f"{self.key_id}:{self.application_key}"
@@ -84,20 +166,7 @@ class B2Client:
             if response.status_code != 200:
                 raise Exception(f"B2 authentication failed: {response.status_code} - {response.text}")
             
-            data = response.json()
-            self._auth_token = data['authorizationToken']
-            self._download_url = data['downloadUrl']
-            self._bucket_id = self._find_bucket_id(data)
-            
-            if not self._bucket_id:
-                raise Exception(f"Bucket '{self.bucket_name}' not found in allowed buckets")
-            
-            # Cache for 23 hours (B2 tokens are valid for 24 hours)
-            self._auth_expires_at = datetime.now() + timedelta(hours=23)
-            self._is_authenticated = True
-            
-            logger.info("B2 authentication successful and cached")
-            return True
+            return response.json()
             
         except requests.RequestException as e:
             logger.error(f"Network error during B2 authentication: {e}")
@@ -139,9 +208,7 @@ class B2Client:
             filename = filename[len(f"{self.audio_folder}/"):]
         
         # Use Native B2 download URL with authorization token
-        download_url = f"{self._download_url}/file/{self.bucket_name}/{self.audio_folder}/{filename}?Authorization={self._auth_token}"
-        
-        return download_url
+        return self._audio_url_prefix + filename + self._url_auth_suffix
     
     def get_thumbnail_url(self, filename: str) -> str:
         """Generate download URL for thumbnail file using Native B2 API (optimized)"""
@@ -156,15 +223,13 @@ class B2Client:
             filename = filename[len(f"{self.thumbnail_folder}/"):]
         
         # Use Native B2 download URL with authorization token
-        download_url = f"{self._download_url}/file/{self.bucket_name}/{self.thumbnail_folder}/{filename}?Authorization={self._auth_token}"
-        
-        return download_url
+        return self._thumbnail_url_prefix + filename + self._url_auth_suffix
     
     def upload_audio(self, file_path: str, filename: str) -> None:
         """Upload audio file to B2"""
         try:
             key = f"{self.audio_folder}/{filename}"
-            self.s3_client.upload_file(file_path, self.bucket_name, key)
+            self.s3_client.upload_file(file_path, self.bucket_name, key, Config=_TRANSFER_CONFIG)
         except ClientError as e:
             logger.error(f"Error uploading audio file {filename}: {e}")
             raise
@@ -173,7 +238,19 @@ class B2Client:
         """Upload thumbnail file to B2"""
         try:
             key = f"{self.thumbnail_folder}/{filename}"
-            self.s3_client.upload_file(file_path, self.bucket_name, key)
+            self.s3_client.upload_file(file_path, self.bucket_name, key, Config=_TRANSFER_CONFIG)
+        except ClientError as e:
+            logger.error(f"Error uploading thumbnail file {filename}: {e}")
+            raise
+    
+    def upload_thumbnail_data(self, data: bytes, filename: str, content_type: str = "image/png") -> None:
+        """Upload an in-memory thumbnail (e.g. converted on the fly) to B2"""
+        try:
+            key = f"{self.thumbnail_folder}/{filename}"
+            self.s3_client.upload_fileobj(
+                io.BytesIO(data), self.bucket_name, key,
+                ExtraArgs={"ContentType": content_type}, Config=_TRANSFER_CONFIG
+            )
         except ClientError as e:
             logger.error(f"Error uploading thumbnail file {filename}: {e}")
             raise
@@ -187,6 +264,34 @@ class B2Client:
         except ClientError:
             return False
     
+    def files_exist(self, folder: str, filenames: List[str]) -> Dict[str, bool]:
+        """
+        Check which of several files exist in B2
+        
+        Args:
+            folder: B2 folder of the files
+            filenames: Object names inside the folder
+        
+        Returns:
+            Dict mapping each filename to whether it exists
+        """
+        if not filenames:
+            return {}
+        
+        if len(filenames) <= FILES_EXIST_LIST_THRESHOLD:
+            # Few keys: independent HEAD requests, run in parallel
+            with ThreadPoolExecutor(max_workers=min(FILES_EXIST_HEAD_WORKERS, len(filenames))) as executor:
+                return dict(zip(filenames, executor.map(lambda name: self.file_exists(folder, name), filenames)))
+        
+        # Many keys: list everything under their common prefix (1000 keys per page)
+        prefix = f"{folder}/{os.path.commonprefix(filenames)}"
+        existing = set()
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            existing.update(obj['Key'] for obj in page.get('Contents', []))
+        
+        return {filename: f"{folder}/{filename}" in existing for filename in filenames}
+    
     def delete_file(self, folder: str, filename: str) -> None:
         """Delete file from B2"""
         try:
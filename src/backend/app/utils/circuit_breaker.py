@@ -0,0 +1,114 @@
+"""
+Circuit breaker for calls to external services
+"""
+
+import threading
+import time
+from typing import Any, Callable
+
+import httpx
+from postgrest.exceptions import APIError
+
+from app.config.logging_global import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# SQLSTATE classes worth retrying: connection exception, transaction rollback
+# (deadlock/serialization), insufficient resources, operator intervention (timeouts)
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed Supabase request may succeed when retried."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        # Raw PostgREST session calls (e.g. RPCs with service role headers)
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    if isinstance(error, APIError):
+        # Non-JSON responses (gateway errors) carry the HTTP status as the code
+        if isinstance(error.code, int):
+            return error.code == 429 or error.code >= 500
+        return str(error.code or "")[:2] in TRANSIENT_SQLSTATE_CLASSES
+    return False
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the service while the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated failures instead of waiting out retries on every call.
+
+    closed: calls go through; fail_threshold consecutive failures open the circuit.
+    open: calls raise CircuitOpenError until reset_timeout seconds have passed.
+    half_open: one probe call goes through; success closes the circuit, failure reopens it.
+    Thread-safe, so concurrent upload batches share one breaker.
+    """
+
+    def __init__(self, fail_threshold: int = 5, reset_timeout: float = 60.0,
+                 is_failure: Callable[[Exception], bool] = lambda e: True):
+        """
+        Args:
+            fail_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe is allowed
+            is_failure: Which exceptions count against the service (others are re-raised only)
+        """
+        self.fail_threshold = fail_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _before_call(self) -> None:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Let exactly one caller probe the service
+                self.state = HALF_OPEN
+                return
+            if self.state != CLOSED:
+                raise CircuitOpenError(f"Circuit open, failing fast for up to {self.reset_timeout:.0f}s")
+
+    def _on_success(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                logger.info("✅ Circuit closed, service recovered")
+            self.state = CLOSED
+            self._failures = 0
+
+    def _on_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.fail_threshold:
+                if self.state != OPEN:
+                    logger.warning(f"⚠️ Circuit opened after {self._failures} consecutive failures")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Call func through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open (func is not called)
+        """
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self._on_failure()
+            elif self.state == HALF_OPEN:
+                # The service answered, so it is reachable again
+                self._on_success()
+            raise
+        self._on_success()
+        return result
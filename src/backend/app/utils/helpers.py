@@ -6,9 +6,9 @@ import os
 import hashlib
 import logging
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Iterator, Optional, Dict, Any
 from datetime import datetime, timezone
-import json
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -24,15 +24,35 @@ def calculate_file_hash(file_path: Path, algorithm: str = "sha256") -> Optional[
         Hex digest of the file hash, or None if error
     """
     try:
-        hash_obj = hashlib.new(algorithm)
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_obj.update(chunk)
-        return hash_obj.hexdigest()
+        with open(file_path, 'rb', buffering=0) as f:  # file_digest brings its own buffer
+            return hashlib.file_digest(f, algorithm).hexdigest()
     except Exception as e:
         logger.error(f"Error calculating hash for {file_path}: {e}")
         return None
 
+def iter_files(directory: Path, suffix: str = ".json") -> Iterator[Path]:
+    """
+    Lazily walk a directory tree with os.scandir, yielding files with a suffix
+    
+    Cheaper than Path.rglob on large trees: entry types come from the directory
+    listing itself, so no file is stat'ed and only matches become Path objects.
+    
+    Args:
+        directory: Root directory to walk
+        suffix: File suffix to match (e.g. ".json")
+    
+    Yields:
+        Matching file paths, in no particular order
+    """
+    pending = [os.fspath(directory)]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.name.endswith(suffix):
+                    yield Path(entry.path)
+
 def format_duration(seconds: float) -> str:
     """
     Format duration in seconds to MM:SS format
@@ -126,9 +146,9 @@ def load_json_safely(file_path: Path) -> Optional[Dict[str, Any]]:
         Parsed JSON data or None if error
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except json.JSONDecodeError as e:
+        with open(file_path, 'rb') as f:
+            return orjson.loads(f.read())
+    except orjson.JSONDecodeError as e:
         logger.error(f"JSON decode error in {file_path}: {e}")
         return None
     except Exception as e:
@@ -150,8 +170,8 @@ def save_json_safely(data: Dict[str, Any], file_path: Path) -> bool:
         # Ensure directory exists
         ensure_directory(file_path.parent)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
         return True
     except Exception as e:
         logger.error(f"Error saving JSON file {file_path}: {e}")
@@ -3,9 +3,12 @@ File validation utilities for Vibify
 """
 
 import os
+import mmap
+import struct
 import logging
+import functools
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Union
 from PIL import Image
 import mutagen
 from mutagen.mp3 import MP3
@@ -13,6 +16,17 @@ from mutagen.id3 import ID3NoHeaderError
 
 logger = logging.getLogger(__name__)
 
+def get_file_metadata(file_path: Union[str, Path]) -> Tuple[int, int, str]:
+    """
+    Get (size, mtime_ns, extension) for a file from a single fresh stat
+    
+    Raises:
+        FileNotFoundError: If the file does not exist
+    """
+    key = os.fspath(file_path)
+    stat_result = os.stat(key)
+    return stat_result.st_size, stat_result.st_mtime_ns, os.path.splitext(key)[1].lower().lstrip('.')
+
 class FileValidator:
     """Validates audio and image files for upload"""
     
@@ -22,20 +36,26 @@ class FileValidator:
         self.allowed_audio_formats = allowed_audio_formats or ["mp3", "wav", "flac", "m4a", "aac"]
         self.allowed_image_formats = allowed_image_formats or ["jpg", "jpeg", "png", "webp"]
     
-    def validate_audio_file(self, file_path: Path) -> Tuple[bool, str]:
+    def validate_audio_file(self, file_path: Path, deep: bool = True) -> Tuple[bool, str]:
         """
         Validate audio file
         
+        Args:
+            file_path: Path to the audio file
+            deep: Also probe the audio metadata with mutagen (opens the file).
+                  Pass deep=False to only check size and extension via a single stat.
+        
         Returns:
             Tuple of (is_valid, error_message)
         """
         try:
-            # Check file exists
-            if not file_path.exists():
+            # Check file exists and get its size + extension (one stat)
+            try:
+                file_size, _, file_ext = get_file_metadata(file_path)
+            except FileNotFoundError:
                 return False, f"File does not exist: {file_path}"
             
             # Check file size
-            file_size = file_path.stat().st_size
             if file_size > self.max_file_size_bytes:
                 return False, f"File too large: {file_size / (1024*1024):.1f}MB > {self.max_file_size_bytes / (1024*1024)}MB"
             
@@ -43,10 +63,13 @@ class FileValidator:
                 return False, "File is empty"
             
             # Check file extension
-            file_ext = file_path.suffix.lower().lstrip('.')
             if file_ext not in self.allowed_audio_formats:
                 return False, f"Unsupported audio format: {file_ext}. Allowed: {', '.join(self.allowed_audio_formats)}"
             
+            # Shallow mode: size + extension only, never open the file
+            if not deep:
+                return True, ""
+            
             # Try to read audio metadata
             try:
                 audio_file = mutagen.File(str(file_path))
@@ -79,12 +102,13 @@ class FileValidator:
             Tuple of (is_valid, error_message)
         """
         try:
-            # Check file exists
-            if not file_path.exists():
+            # Check file exists and get its size + extension (one stat)
+            try:
+                file_size, _, file_ext = get_file_metadata(file_path)
+            except FileNotFoundError:
                 return False, f"File does not exist: {file_path}"
             
             # Check file size
-            file_size = file_path.stat().st_size
             if file_size > self.max_file_size_bytes:
                 return False, f"File too large: {file_size / (1024*1024):.1f}MB > {self.max_file_size_bytes / (1024*1024)}MB"
             
@@ -92,7 +116,6 @@ class FileValidator:
                 return False, "File is empty"
             
             # Check file extension
-            file_ext = file_path.suffix.lower().lstrip('.')
             if file_ext not in self.allowed_image_formats:
                 return False, f"Unsupported image format: {file_ext}. Allowed: {', '.join(self.allowed_image_formats)}"
             
@@ -118,19 +141,28 @@ class FileValidator:
             logger.error(f"Error validating image file {file_path}: {e}")
             return False, f"Validation error: {str(e)}"
     
-    def validate_file_pair(self, audio_path: Path, image_path: Path) -> Tuple[bool, List[str]]:
+    def validate_file_pair(self, audio_path: Path, image_path: Path, deep: bool = True,
+                           fail_fast: bool = True) -> Tuple[bool, List[str]]:
         """
         Validate both audio and image files for a song
         
+        Args:
+            audio_path: Path to the audio file
+            image_path: Path to the image file
+            deep: Probe audio metadata as well (see validate_audio_file)
+            fail_fast: Skip the image checks when the audio is already invalid
+        
         Returns:
             Tuple of (is_valid, list_of_errors)
         """
         errors = []
         
         # Validate audio file
-        audio_valid, audio_error = self.validate_audio_file(audio_path)
+        audio_valid, audio_error = self.validate_audio_file(audio_path, deep=deep)
         if not audio_valid:
             errors.append(f"Audio: {audio_error}")
+            if fail_fast:
+                return False, errors
         
         # Validate image file
         image_valid, image_error = self.validate_image_file(image_path)
@@ -139,21 +171,130 @@ class FileValidator:
         
         return len(errors) == 0, errors
 
-def get_audio_duration(file_path: Path) -> Optional[float]:
-    """Get audio file duration in seconds"""
+# MPEG audio Layer III lookup tables, indexed by the header bit fields
+_MP3_BITRATES_KBPS = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),  # MPEG 1
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG 2
+    0: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),      # MPEG 2.5
+}
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+_MP3_PROBE_BYTES = 8192
+
+def _fast_mp3_duration(file_path: Union[str, Path]) -> Optional[float]:
+    """
+    Compute MP3 duration from the first frame header only
+    
+    Uses the Xing/Info or VBRI frame count when present (VBR), otherwise
+    derives the duration from the audio size and bitrate (CBR). Only the
+    first few KB of the file are touched.
+    
+    Returns:
+        Duration in seconds, or None if no Layer III frame header was found
+    """
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size == 0:
+            return None
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Skip ID3v2 tag (size is a 28-bit synchsafe integer)
+            audio_start = 0
+            if mm[:3] == b'ID3' and file_size >= 10:
+                tag_size = (mm[6] << 21) | (mm[7] << 14) | (mm[8] << 7) | mm[9]
+                audio_start = 10 + tag_size + (10 if mm[5] & 0x10 else 0)
+            
+            # Skip trailing ID3v1 tag
+            audio_end = file_size
+            if file_size >= 128 and mm[file_size - 128:file_size - 125] == b'TAG':
+                audio_end -= 128
+            
+            pos = mm.find(b'\xff', audio_start, min(audio_start + _MP3_PROBE_BYTES, file_size - 4))
+            while pos != -1:
+                b1, b2, b3 = mm[pos + 1], mm[pos + 2], mm[pos + 3]
+                version = (b1 >> 3) & 0x03
+                layer = (b1 >> 1) & 0x03
+                bitrate_index = b2 >> 4
+                sample_rate_index = (b2 >> 2) & 0x03
+                
+                is_valid_header = (
+                    (b1 & 0xE0) == 0xE0 and version != 1 and layer == 1
+                    and 0 < bitrate_index < 15 and sample_rate_index != 3
+                )
+                if is_valid_header:
+                    bitrate = _MP3_BITRATES_KBPS[version][bitrate_index] * 1000
+                    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+                    samples_per_frame = 1152 if version == 3 else 576
+                    is_mono = (b3 >> 6) == 3
+                    
+                    # Xing/Info header sits right after the side information
+                    if version == 3:
+                        side_info_size = 17 if is_mono else 32
+                    else:
+                        side_info_size = 9 if is_mono else 17
+                    
+                    xing = pos + 4 + side_info_size
+                    if mm[xing:xing + 4] in (b'Xing', b'Info'):
+                        flags = struct.unpack('>I', mm[xing + 4:xing + 8])[0]
+                        if flags & 0x01:
+                            frames = struct.unpack('>I', mm[xing + 8:xing + 12])[0]
+                            return frames * samples_per_frame / sample_rate
+                    
+                    vbri = pos + 4 + 32
+                    if mm[vbri:vbri + 4] == b'VBRI':
+                        frames = struct.unpack('>I', mm[vbri + 14:vbri + 18])[0]
+                        return frames * samples_per_frame / sample_rate
+                    
+                    return (audio_end - pos) * 8 / bitrate
+                
+                pos = mm.find(b'\xff', pos + 1, min(audio_start + _MP3_PROBE_BYTES, file_size - 4))
+    
+    return None
+
+@functools.lru_cache(maxsize=32768)
+def _cached_audio_duration(path_str: str, mtime_ns: int, size: int) -> Optional[float]:
+    """Duration lookup keyed by a fresh (path, mtime_ns, size) so edited files are re-read"""
     try:
-        audio_file = mutagen.File(str(file_path))
+        # MP3s only need their first frame header, other formats go through mutagen
+        if path_str.lower().endswith('.mp3'):
+            duration = _fast_mp3_duration(path_str)
+            if duration is not None:
+                return duration
+        
+        audio_file = mutagen.File(path_str)
         if audio_file and hasattr(audio_file, 'info') and hasattr(audio_file.info, 'length'):
             return audio_file.info.length
     except Exception as e:
+        logger.warning(f"Could not get duration for {path_str}: {e}")
+    return None
+
+def get_audio_duration(file_path: Path) -> Optional[float]:
+    """Get audio file duration in seconds"""
+    try:
+        size, mtime_ns, _ = get_file_metadata(file_path)
+    except OSError as e:
         logger.warning(f"Could not get duration for {file_path}: {e}")
+        return None
+    return _cached_audio_duration(os.fspath(file_path), mtime_ns, size)
+
+@functools.lru_cache(maxsize=32768)
+def _cached_image_dimensions(path_str: str, mtime_ns: int, size: int) -> Optional[Tuple[int, int]]:
+    """Dimension lookup keyed by a fresh (path, mtime_ns, size) so edited files are re-read"""
+    try:
+        with Image.open(path_str) as img:
+            return img.size
+    except Exception as e:
+        logger.warning(f"Could not get dimensions for {path_str}: {e}")
     return None
 
 def get_image_dimensions(file_path: Path) -> Optional[Tuple[int, int]]:
     """Get image dimensions as (width, height)"""
     try:
-        with Image.open(file_path) as img:
-            return img.size
-    except Exception as e:
+        size, mtime_ns, _ = get_file_metadata(file_path)
+    except OSError as e:
         logger.warning(f"Could not get dimensions for {file_path}: {e}")
-    return None
+        return None
+    return _cached_image_dimensions(os.fspath(file_path), mtime_ns, size)
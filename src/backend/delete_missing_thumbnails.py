@@ -4,6 +4,7 @@ Script to delete songs from Supabase database that have missing thumbnails.
 Reads the missing_thumbnails.txt file and deletes those songs in batches.
 """
 
+import argparse
 import sys
 from pathlib import Path
 from typing import List
@@ -41,7 +42,7 @@ def read_song_ids_from_file(file_path: str) -> List[str]:
         return []
 
 
-def delete_songs_in_batches(song_ids: List[str], batch_size: int = 100) -> bool:
+def delete_songs_in_batches(song_ids: List[str], batch_size: int = 500) -> bool:
     """
     Delete songs from the database in batches.
     
@@ -94,6 +95,13 @@ def delete_songs_in_batches(song_ids: List[str], batch_size: int = 100) -> bool:
 
 def main():
     """Main function to delete songs with missing thumbnails."""
+    parser = argparse.ArgumentParser(description="Delete songs with missing thumbnails from Supabase")
+    parser.add_argument("--yes", "-y", action="store_true",
+                       help="Skip the confirmation prompt (for cron/automation)")
+    parser.add_argument("--batch-size", type=int, default=500,
+                       help="Number of songs to delete per batch (default: 500)")
+    args = parser.parse_args()
+    
     logger.info("🗑️  Starting deletion of songs with missing thumbnails...")
     
     # Read song IDs from file
@@ -107,21 +115,21 @@ def main():
     logger.info(f"Found {len(song_ids)} songs to delete")
     
     # Show first 10 examples
-    logger.info(f"First 10 songs to delete:")
-    for song_id in song_ids[:10]:
-        logger.info(f"  - {song_id}")
+    examples = "\n  - ".join(song_ids[:10])
+    logger.info(f"First 10 songs to delete:\n  - {examples}")
     
     if len(song_ids) > 10:
         logger.info(f"  ... and {len(song_ids) - 10} more")
     
-    # Ask for confirmation
-    response = input(f"\nDo you want to delete these {len(song_ids)} songs? (y/N): ")
-    if response.lower() != 'y':
-        logger.info("Deletion cancelled by user")
-        return
+    # Ask for confirmation unless running non-interactively
+    if not args.yes:
+        response = input(f"\nDo you want to delete these {len(song_ids)} songs? (y/N): ")
+        if response.lower() != 'y':
+            logger.info("Deletion cancelled by user")
+            return
     
     # Delete the songs
-    success = delete_songs_in_batches(song_ids, batch_size=100)
+    success = delete_songs_in_batches(song_ids, batch_size=args.batch_size)
     
     if success:
         logger.info("✅ Deletion completed successfully!")
@@ -28,6 +28,8 @@ if __name__ == "__main__":
         "app.main:app",
         host="0.0.0.0",
         port=8000,
+        http="httptools",
+        loop="uvloop" if sys.platform != "win32" else "asyncio",  # uvloop has no Windows build
         reload=True,
         reload_dirs=[str(current_dir)]
     )
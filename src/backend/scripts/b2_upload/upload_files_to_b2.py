@@ -4,6 +4,7 @@ Improved version with better structure and error handling
 """
 
 import os
+import re
 import json
 from pathlib import Path
 import b2sdk.v2 as b2
@@ -13,7 +14,9 @@ import sys
 from PIL import Image
 import io
 import tempfile
-from typing import Dict, List, Tuple, Optional
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Set, Tuple, Optional
 import logging
 
 # Load environment variables
@@ -30,6 +33,35 @@ from app.config.logging_global import get_logger
 
 logger = get_logger(__name__)
 
+# Matches the numeric stem of uploaded files, e.g. "audio/000123.mp3"
+FILE_NUMBER_PATTERN = re.compile(r'(?:audio|thumbnails)/(\d+)\.')
+
+# Upload concurrency: parts per large file x files in flight stays at ~32 HTTPS streams
+MAX_UPLOAD_WORKERS = 8
+MAX_CONCURRENT_FILES = 4
+
+# zlib level for thumbnail PNGs
+PNG_COMPRESS_LEVEL = 1
+
+def _convert_webp_to_png(webp_path: str) -> bytes:
+    """Convert WebP to PNG format (module-level so worker processes can pickle it)"""
+    with Image.open(webp_path) as img:
+        # Already a PNG: upload the original bytes instead of decoding + re-encoding
+        if img.format == 'PNG':
+            return Path(webp_path).read_bytes()
+        png_data = io.BytesIO()
+        # Fastest zlib level, the output is only slightly larger than the default level 6
+        img.save(png_data, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+        return png_data.getvalue()
+
+def _convert_pair(pair: Tuple[str, str]) -> Tuple[str, str, Optional[bytes], Optional[str]]:
+    """Pool worker: convert one thumbnail, returning the error instead of raising"""
+    thumb_file, b2_path = pair
+    try:
+        return thumb_file, b2_path, _convert_webp_to_png(thumb_file), None
+    except Exception as e:
+        return thumb_file, b2_path, None, str(e)
+
 class B2Uploader:
     def __init__(self):
         from app.config.simple_config import Config
@@ -40,6 +72,10 @@ class B2Uploader:
         self.audio_dir = Path(Config.AUDIO_FOLDER)
         self.thumbnail_dir = Path(Config.THUMBNAIL_FOLDER)
         
+        # Cached API + bucket handle (authorized once per uploader)
+        self._api = None
+        self._bucket = None
+        
         if not all([self.key_id, self.application_key, self.bucket_name]):
             raise ValueError("Missing required B2 environment variables")
     
@@ -47,125 +83,169 @@ class B2Uploader:
         """Test B2 authentication"""
         try:
             logger.info("Testing B2 authentication...")
-            info = b2.InMemoryAccountInfo()
-            b2_api = b2.B2Api(info)
-            b2_api.authorize_account("production", self.key_id, self.application_key)
+            self.get_bucket()
             logger.info("✓ B2 authentication successful!")
             return True
         except b2.exception.B2Error as e:
             logger.error(f"✗ B2 authentication failed: {str(e)}")
             return False
     
+    def _get_api(self):
+        """Get an authorized B2 API instance (cached, authorized once per uploader)"""
+        if self._api is None:
+            # Keep credentials and the auth token in memory only
+            api = b2.B2Api(b2.InMemoryAccountInfo(), max_upload_workers=MAX_UPLOAD_WORKERS)
+            api.authorize_account("production", self.key_id, self.application_key)
+            self._api = api
+        return self._api
+    
     def get_bucket(self):
-        """Get B2 bucket instance"""
-        info = b2.InMemoryAccountInfo()
-        b2_api = b2.B2Api(info)
-        b2_api.authorize_account("production", self.key_id, self.application_key)
-        return b2_api.get_bucket_by_name(self.bucket_name)
+        """Get B2 bucket instance (cached)"""
+        if self._bucket is None:
+            self._bucket = self._get_api().get_bucket_by_name(self.bucket_name)
+        return self._bucket
     
-    def list_existing_files(self, bucket) -> Tuple[Dict[str, str], int]:
+    def list_existing_files(self, bucket) -> Tuple[Set[str], int]:
         """List existing files in B2 and find highest file number"""
         logger.info("Listing existing files in B2 bucket...")
-        existing_files = {}
-        highest_number = -1
+        existing_files = set()
         
         try:
             for folder in ["audio/", "thumbnails/"]:
-                for file_info, _ in bucket.ls(folder_to_list=folder, recursive=True):
-                    existing_files[file_info.file_name] = file_info.id_
+                # Page through b2_list_file_names directly (10000 is the API maximum)
+                start_file_name = None
+                while True:
+                    response = bucket.api.session.list_file_names(
+                        bucket.id_,
+                        start_file_name=start_file_name,
+                        max_file_count=10000,
+                        prefix=folder
+                    )
+                    existing_files.update(f["fileName"] for f in response["files"])
                     
-                    # Extract file number
-                    try:
-                        filename = file_info.file_name.split('/')[-1].split('.')[0]
-                        file_number = int(filename)
-                        highest_number = max(highest_number, file_number)
-                    except (ValueError, IndexError):
-                        continue
+                    start_file_name = response.get("nextFileName")
+                    if start_file_name is None:
+                        break
+            
+            # Extract file numbers
+            numbers = (int(m.group(1)) for m in map(FILE_NUMBER_PATTERN.match, existing_files) if m)
+            highest_number = max(numbers, default=-1)
             
             logger.info(f"Found {len(existing_files)} existing files, highest number: {highest_number}")
             return existing_files, highest_number
             
         except Exception as e:
             logger.error(f"Error listing files: {e}")
-            return {}, -1
+            return set(), -1
     
-    def convert_webp_to_png(self, webp_path: Path) -> bytes:
+    def convert_webp_to_png(self, webp_path: str) -> bytes:
         """Convert WebP to PNG format"""
         try:
-            img = Image.open(webp_path)
-            png_data = io.BytesIO()
-            img.save(png_data, format='PNG')
-            return png_data.getvalue()
+            return _convert_webp_to_png(webp_path)
         except Exception as e:
             logger.error(f"Error converting {webp_path}: {e}")
             raise
     
-    def upload_audio_files(self, bucket, file_pairs: List[Tuple[Path, str]], 
-                          existing_files: Dict[str, str], stats: Dict[str, int]) -> None:
+    def _upload_audio_file(self, bucket, mp3_file: str, b2_path: str) -> None:
+        """Upload one audio file, letting b2sdk split large files into parallel parts"""
+        bucket.upload(
+            upload_source=b2.UploadSourceLocalFile(mp3_file),
+            file_name=b2_path,
+            content_type="audio/mpeg"
+        )
+    
+    def upload_audio_files(self, bucket, file_pairs: List[Tuple[str, str]], 
+                          existing_files: Set[str], stats: Dict[str, int]) -> None:
         """Upload audio files to B2"""
         logger.info(f"Uploading {len(file_pairs)} audio files...")
         
-        for mp3_file, b2_path in tqdm(file_pairs, desc="Uploading audio"):
-            try:
-                if b2_path in existing_files:
-                    stats["already_exists"] += 1
-                    continue
-                
-                bucket.upload_local_file(
-                    local_file=str(mp3_file),
-                    file_name=b2_path,
-                    content_type="audio/mpeg"
-                )
-                stats["uploaded"] += 1
-                
-            except Exception as e:
-                logger.error(f"Error uploading {mp3_file.name}: {e}")
-                stats["failed"] += 1
+        pending_pairs = []
+        for mp3_file, b2_path in file_pairs:
+            if b2_path in existing_files:
+                stats["already_exists"] += 1
+            else:
+                pending_pairs.append((mp3_file, b2_path))
+        
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FILES) as executor:
+            futures = {
+                executor.submit(self._upload_audio_file, bucket, mp3_file, b2_path): mp3_file
+                for mp3_file, b2_path in pending_pairs
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Uploading audio"):
+                try:
+                    future.result()
+                    stats["uploaded"] += 1
+                except Exception as e:
+                    logger.error(f"Error uploading {os.path.basename(futures[future])}: {e}")
+                    stats["failed"] += 1
     
-    def upload_thumbnail_files(self, bucket, file_pairs: List[Tuple[Path, str]], 
-                              existing_files: Dict[str, str], stats: Dict[str, int]) -> None:
+    def upload_thumbnail_files(self, bucket, file_pairs: List[Tuple[str, str]], 
+                              existing_files: Set[str], stats: Dict[str, int]) -> None:
         """Upload thumbnail files to B2 (converting WebP to PNG)"""
         logger.info(f"Uploading {len(file_pairs)} thumbnail files...")
         
-        for thumb_file, b2_path in tqdm(file_pairs, desc="Uploading thumbnails"):
-            try:
-                if b2_path in existing_files:
-                    stats["already_exists"] += 1
+        pending_pairs = []
+        for thumb_file, b2_path in file_pairs:
+            if b2_path in existing_files:
+                stats["already_exists"] += 1
+            else:
+                pending_pairs.append((thumb_file, b2_path))
+        
+        if not pending_pairs:
+            return
+        
+        # Convert WebP to PNG on all cores while this process uploads finished files.
+        # Spawn, not fork: this runs on a worker thread while the audio pool and b2sdk upload
+        # threads may hold locks, and a forked child would inherit them locked
+        with multiprocessing.get_context("spawn").Pool(processes=os.cpu_count()) as pool:
+            results = pool.imap_unordered(_convert_pair, pending_pairs, chunksize=4)
+            for thumb_file, b2_path, png_data, error in tqdm(results, total=len(pending_pairs), desc="Uploading thumbnails"):
+                if error is not None:
+                    logger.error(f"Error converting {thumb_file}: {error}")
+                    stats["failed"] += 1
                     continue
                 
-                # Convert WebP to PNG
-                png_data = self.convert_webp_to_png(thumb_file)
                 stats["converted"] += 1
                 
-                # Upload PNG data
-                bucket.upload_bytes(
-                    data_bytes=png_data,
-                    file_name=b2_path,
-                    content_type="image/png"
-                )
-                stats["uploaded"] += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing {thumb_file.name}: {e}")
-                stats["failed"] += 1
+                try:
+                    # Upload PNG data
+                    bucket.upload_bytes(
+                        data_bytes=png_data,
+                        file_name=b2_path,
+                        content_type="image/png"
+                    )
+                    stats["uploaded"] += 1
+                    
+                except Exception as e:
+                    logger.error(f"Error processing {os.path.basename(thumb_file)}: {e}")
+                    stats["failed"] += 1
     
-    def get_matching_file_pairs(self, max_pairs: int = 10000) -> Tuple[List[Tuple[Path, str]], List[Tuple[Path, str]]]:
+    def get_matching_file_pairs(self, max_pairs: int = 10000) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
         """Get matching audio-thumbnail file pairs"""
-        # Get all files and sort by number
-        mp3_files = sorted(list(self.audio_dir.glob("*.mp3")), key=lambda x: int(x.stem))
-        thumbnail_files = sorted(list(self.thumbnail_dir.glob("*.webp")), key=lambda x: int(x.stem))
-        
-        # Create lookup dictionaries
-        mp3_dict = {int(f.stem): f for f in mp3_files}
-        thumbnail_dict = {int(f.stem): f for f in thumbnail_files}
+        # Single scandir pass per folder; DirEntry caches the file type so no extra stat
+        mp3_dict = {
+            int(stem): entry.path
+            for entry in os.scandir(self.audio_dir)
+            if entry.name.endswith(".mp3") and (stem := entry.name[:-4]).isdigit()
+            and entry.is_file(follow_symlinks=False)
+        }
+        thumbnail_dict = {
+            int(stem): entry.path
+            for entry in os.scandir(self.thumbnail_dir)
+            if entry.name.endswith(".webp") and (stem := entry.name[:-5]).isdigit()
+            and entry.is_file(follow_symlinks=False)
+        }
         
         # Find matching pairs
-        matching_numbers = sorted(set(mp3_dict.keys()) & set(thumbnail_dict.keys()))
-        matching_numbers = matching_numbers[:max_pairs]
+        matching_numbers = sorted(mp3_dict.keys() & thumbnail_dict.keys())[:max_pairs]
         
-        # Create file pairs
-        audio_pairs = [(mp3_dict[num], f"audio/{str(num).zfill(6)}.mp3") for num in matching_numbers]
-        thumbnail_pairs = [(thumbnail_dict[num], f"thumbnails/{str(num).zfill(6)}.png") for num in matching_numbers]
+        # Create file pairs, formatting each number once
+        audio_pairs = []
+        thumbnail_pairs = []
+        for num in matching_numbers:
+            name = f"{num:06d}"
+            audio_pairs.append((mp3_dict[num], f"audio/{name}.mp3"))
+            thumbnail_pairs.append((thumbnail_dict[num], f"thumbnails/{name}.png"))
         
         return audio_pairs, thumbnail_pairs
     
@@ -183,7 +263,7 @@ class B2Uploader:
             return
         
         # Get existing files
-        existing_files = {}
+        existing_files = set()
         if check_existing:
             existing_files, _ = self.list_existing_files(bucket)
         
@@ -196,17 +276,21 @@ class B2Uploader:
         
         logger.info(f"Found {len(audio_pairs)} matching file pairs to upload")
         
-        # Initialize stats
-        stats = {
-            "uploaded": 0,
-            "already_exists": 0,
-            "failed": 0,
-            "converted": 0
-        }
+        # Initialize stats (one dict per phase so the two threads never share counters)
+        audio_stats, thumbnail_stats = (
+            {"uploaded": 0, "already_exists": 0, "failed": 0, "converted": 0} for _ in range(2)
+        )
+        
+        # Audio and thumbnails are independent keys, upload both phases at the same time
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            phases = [
+                executor.submit(self.upload_audio_files, bucket, audio_pairs, existing_files, audio_stats),
+                executor.submit(self.upload_thumbnail_files, bucket, thumbnail_pairs, existing_files, thumbnail_stats)
+            ]
+            for phase in phases:
+                phase.result()
         
-        # Upload files
-        self.upload_audio_files(bucket, audio_pairs, existing_files, stats)
-        self.upload_thumbnail_files(bucket, thumbnail_pairs, existing_files, stats)
+        stats = {key: audio_stats[key] + thumbnail_stats[key] for key in audio_stats}
         
         # Print summary
         logger.info("\nUpload Summary:")
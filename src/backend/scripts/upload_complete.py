@@ -4,14 +4,13 @@ Handles both B2 file uploads and Supabase metadata uploads
 """
 
 import os
-import json
 import asyncio
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from dotenv import load_dotenv
-from supabase import create_client, Client
 from tqdm import tqdm
 
 # Import centralized logging
@@ -25,7 +24,13 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from app.config.simple_config import Config
 from b2_upload.upload_files_to_b2 import B2Uploader
-from upload_from_json import process_song_data, process_genres, upload_song_to_supabase
+from upload_from_json import _parse_one, resolve_genres_bulk, supabase, upload_songs_batch
+
+# Rows per PostgREST request when uploading metadata
+SUPABASE_BATCH_SIZE = 1000
+
+# Concurrent per-song URL updates in flight
+URL_UPDATE_CONCURRENCY = 32
 
 # Load environment variables
 # load_dotenv()
@@ -33,7 +38,7 @@ from upload_from_json import process_song_data, process_genres, upload_song_to_s
 class CompleteUploader:
     def __init__(self):
         self.b2_uploader = B2Uploader()
-        self.supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
+        self.supabase = supabase  # Share the client already created by upload_from_json
         self.json_folder = Path(Config.JSON_METADATA_FOLDER)
         self.audio_dir = Path(Config.AUDIO_FOLDER)
         self.thumbnail_dir = Path(Config.THUMBNAIL_FOLDER)
@@ -43,29 +48,42 @@ class CompleteUploader:
         if not self.json_folder.exists():
             raise FileNotFoundError(f"JSON folder not found: {self.json_folder}")
         
-        json_files = list(self.json_folder.glob("*.json"))
         processed_songs = []
         
-        for json_file in tqdm(json_files, desc="Processing JSON files"):
+        # Decode + shape files on all cores, fed straight from the directory walk
+        with ProcessPoolExecutor() as executor:
+            results = executor.map(_parse_one, self.json_folder.glob("*.json"), chunksize=64)
+            for json_file, song_info, error in tqdm(results, desc="Processing JSON files", unit="files"):
+                if error is not None:
+                    logger.error(f"Error processing {json_file}: {error}")
+                    continue
+                processed_songs.append(song_info)
+        
+        return processed_songs
+    
+    def upload_metadata(self, processed_songs: List[Dict[str, Any]], batch_size: int = SUPABASE_BATCH_SIZE) -> int:
+        """Upsert songs and their genre links in batches, returns number of songs uploaded"""
+        success_count = 0
+        
+        # Resolve every distinct genre once, up front
+        try:
+            genre_id_by_name = resolve_genres_bulk(
+                genre for song_info in processed_songs for genre in song_info["genres"]
+            )
+        except Exception as e:
+            logger.error(f"Error resolving genres: {e}")
+            return 0
+        
+        # One transactional RPC per batch: songs and links land together or not at all
+        for start in tqdm(range(0, len(processed_songs), batch_size), desc="Uploading to Supabase"):
+            batch = processed_songs[start:start + batch_size]
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                # Process song data
-                song_data = process_song_data(data)
-                genres = data.get("tags", [])
-                
-                processed_songs.append({
-                    "song_data": song_data,
-                    "genres": genres,
-                    "file_path": json_file
-                })
-                
+                upload_songs_batch(batch, genre_id_by_name)
+                success_count += len(batch)
             except Exception as e:
-                logger.error(f"Error processing {json_file}: {e}")
-                continue
+                logger.error(f"Error uploading songs batch starting at {start}: {e}")
         
-        return processed_songs
+        return success_count
     
     def update_song_urls(self, song_id: str, audio_filename: str, thumbnail_filename: str) -> bool:
         """Update song URLs after B2 upload"""
@@ -86,8 +104,41 @@ class CompleteUploader:
             logger.error(f"Error updating URLs for {song_id}: {e}")
             return False
     
+    async def _update_song_urls_bounded(self, semaphore: asyncio.Semaphore, song_id: str) -> bool:
+        """Run one blocking URL update in a worker thread, capped by the semaphore"""
+        async with semaphore:
+            return await asyncio.to_thread(self.update_song_urls, song_id, f"{song_id}.mp3", f"{song_id}.png")
+    
+    async def _upload_complete_async(self, processed_songs: List[Dict[str, Any]], max_songs: int) -> None:
+        """Run Steps 2-4, overlapping the Supabase and B2 uploads"""
+        # Steps 2 + 3: metadata and files have no dependency on each other, run them together
+        logger.info("Steps 2 + 3: Uploading metadata to Supabase and files to B2 concurrently...")
+        success_count, _ = await asyncio.gather(
+            asyncio.to_thread(self.upload_metadata, processed_songs),
+            asyncio.to_thread(self.b2_uploader.upload_all_files, check_existing=True, max_pairs=max_songs)
+        )
+        
+        logger.info(f"Successfully uploaded {success_count}/{len(processed_songs)} songs to Supabase")
+        
+        # Step 4: Update URLs in Supabase (needs both previous steps)
+        logger.info("Step 4: Updating URLs in Supabase...")
+        semaphore = asyncio.Semaphore(URL_UPDATE_CONCURRENCY)
+        results = await asyncio.gather(*[
+            self._update_song_urls_bounded(semaphore, song_info["song_data"]["id"])
+            for song_info in processed_songs
+        ])
+        url_update_count = sum(results)
+        
+        logger.info(f"Updated URLs for {url_update_count}/{len(processed_songs)} songs")
+        
+        # Final summary
+        logger.info("Upload process complete!")
+        logger.info(f"- Songs processed: {len(processed_songs)}")
+        logger.info(f"- Metadata uploaded: {success_count}")
+        logger.info(f"- URLs updated: {url_update_count}")
+    
     def upload_complete(self, max_songs: int = 10000) -> None:
-        """Complete upload process: JSON → Supabase → B2 → Update URLs"""
+        """Complete upload process: JSON → (Supabase ∥ B2) → Update URLs"""
         
         logger.info("Starting complete Vibify upload process...")
         
@@ -100,44 +151,19 @@ class CompleteUploader:
             return
         
         # Limit songs
-        max_songs = min(max_songs, settings.max_upload_files)
+        max_songs = min(max_songs, Config.MAX_UPLOAD_FILES)
         processed_songs = processed_songs[:max_songs]
         logger.info(f"Processing {len(processed_songs)} songs")
         
-        # Step 2: Upload metadata to Supabase
-        logger.info("Step 2: Uploading metadata to Supabase...")
-        success_count = 0
-        for song_info in tqdm(processed_songs, desc="Uploading to Supabase"):
-            if upload_song_to_supabase(song_info["song_data"], song_info["genres"]):
-                success_count += 1
-        
-        logger.info(f"Successfully uploaded {success_count}/{len(processed_songs)} songs to Supabase")
-        
-        # Step 3: Upload files to B2
-        logger.info("Step 3: Uploading files to B2...")
-        self.b2_uploader.upload_all_files(check_existing=True, max_pairs=max_songs)
-        
-        # Step 4: Update URLs in Supabase
-        logger.info("Step 4: Updating URLs in Supabase...")
-        url_update_count = 0
-        for song_info in tqdm(processed_songs, desc="Updating URLs"):
-            song_id = song_info["song_data"]["id"]
-            audio_filename = f"{song_id}.mp3"
-            thumbnail_filename = f"{song_id}.png"
-            
-            if self.update_song_urls(song_id, audio_filename, thumbnail_filename):
-                url_update_count += 1
-        
-        logger.info(f"Updated URLs for {url_update_count}/{len(processed_songs)} songs")
-        
-        # Final summary
-        logger.info("Upload process complete!")
-        logger.info(f"- Songs processed: {len(processed_songs)}")
-        logger.info(f"- Metadata uploaded: {success_count}")
-        logger.info(f"- URLs updated: {url_update_count}")
+        asyncio.run(self._upload_complete_async(processed_songs, max_songs))
 
 def main():
     """Main function"""
+    # Metadata goes through insert_songs_with_genres, which only the service role may execute
+    if not Config.SUPABASE_SERVICE_ROLE_KEY:
+        logger.error("SUPABASE_SERVICE_ROLE_KEY not configured")
+        sys.exit(1)
+    
     try:
         uploader = CompleteUploader()
         
@@ -4,61 +4,138 @@ Modified to work with our current database schema
 """
 
 import os
-import json
 import asyncio
 import logging
+import io
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Set, Tuple
 from datetime import datetime
+from functools import lru_cache
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import Client
 from tqdm import tqdm
+import ijson
+import orjson
+from PIL import Image
 
 # Import centralized logging and config
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 from app.config.logging_global import get_logger
 from app.config.simple_config import Config
+from app.config.constants import (
+    CIRCUIT_FAIL_THRESHOLD, CIRCUIT_RESET_TIMEOUT, MAX_CONCURRENT_BATCHES,
+    MAXIMUM_RETRIES, RETRY_DELAY, RETRY_MAX_DELAY,
+)
+from app.database.connection import SupabaseClient
+from app.services.genre_cache import genre_cache
+from app.services.upload_manifest import UploadManifest
+from app.services.b2_cache import B2KeyCache
+from app.utils.b2_client import B2Client
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, is_transient_error
 
 logger = get_logger(__name__)
 
-# Supabase configuration
-supabase: Client = create_client(
-    Config.SUPABASE_URL,
-    Config.SUPABASE_KEY
-)
+# Rows per songs upsert request
+BATCH_SIZE = 500
+
+# Genre names per .in_() lookup; the filter travels in the URL, so keep it well under ~8 KB
+GENRE_LOOKUP_CHUNK_SIZE = 200
+
+# Rows that still fail after bisection, kept for a later re-run
+FAILED_SONGS_FILE = Path(".cache/failed.jsonl")
+
+# Media files uploaded to B2 at once
+MAX_CONCURRENT_MEDIA_UPLOADS = 16
+
+# zlib level for thumbnail PNGs (fastest; output is only slightly larger than level 6)
+PNG_COMPRESS_LEVEL = 1
+
+# Supabase configuration (process-wide pooled client)
+supabase: Client = SupabaseClient().get_client()
 
+# Shared by all chunks: during a Supabase outage the remaining chunks fail fast instead of each retrying
+breaker = CircuitBreaker(CIRCUIT_FAIL_THRESHOLD, CIRCUIT_RESET_TIMEOUT, is_failure=is_transient_error)
+
+# Privileged RPCs (insert_songs_with_genres) are not executable with the public anon key
+SERVICE_ROLE_HEADERS = {
+    "apikey": Config.SUPABASE_SERVICE_ROLE_KEY,
+    "Authorization": f"Bearer {Config.SUPABASE_SERVICE_ROLE_KEY}",
+}
+
+# Top-level metadata keys read by process_song_data / process_json_files
+METADATA_KEYS = frozenset({
+    "id", "title", "artist", "album", "duration", "release_date", "view_count",
+    "like_count", "description", "source_url", "audio_url", "thumbnail_url",
+    "created_at", "tags"
+})
+REQUIRED_METADATA_KEYS = frozenset({"id", "title", "artist", "duration"})
+
+def read_metadata(json_file: Path) -> Dict[str, Any]:
+    """Stream-parse only the metadata keys we use, stopping once all are seen"""
+    data = {}
+    with open(json_file, 'rb') as f:
+        for key, value in ijson.kvitems(f, "", use_float=True):
+            if key in METADATA_KEYS:
+                data[key] = value
+                if len(data) == len(METADATA_KEYS):
+                    break
+    
+    # Files that nest the song fields deeper need the full document
+    if not REQUIRED_METADATA_KEYS <= data.keys():
+        with open(json_file, 'rb') as f:
+            return orjson.loads(f.read())
+    return data
+
+@lru_cache(maxsize=8192)
 def convert_release_date(date_str: str) -> Optional[str]:
-    """Convert YYYYMMDD format to YYYY-MM-DD"""
+    """Convert YYYYMMDD format to YYYY-MM-DD (cached, many songs share a release date)"""
     if not date_str or len(date_str) != 8:
         return None
-    try:
-        year = date_str[:4]
-        month = date_str[4:6]
-        day = date_str[6:8]
-        return f"{year}-{month}-{day}"
-    except:
-        return None
+    return f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}"
+
+def resolve_genres_bulk(genre_names: Iterable[str]) -> Dict[str, int]:
+    """Resolve genre names to IDs from the local genre cache, hitting Supabase only for unknown names"""
+    names = set(genre_names)
+    if not names:
+        return {}
+    
+    known_genres = genre_cache.get(supabase)
+    genre_id_by_name = {name: known_genres[name] for name in names if name in known_genres}
+    
+    missing = names - genre_id_by_name.keys()
+    if not missing:
+        return genre_id_by_name
+    
+    # Fetch genres the cache doesn't know yet, chunked so the .in_() filter stays within URL limits
+    missing_names = list(missing)
+    new_genres = {}
+    for start in range(0, len(missing_names), GENRE_LOOKUP_CHUNK_SIZE):
+        existing = supabase.table("genres").select("id, name").in_(
+            "name", missing_names[start:start + GENRE_LOOKUP_CHUNK_SIZE]
+        ).execute()
+        new_genres.update({genre["name"]: genre["id"] for genre in existing.data})
+    
+    # Create any missing genres in one round-trip
+    missing -= new_genres.keys()
+    if missing:
+        created = supabase.table("genres").upsert(
+            [{"name": name, "category": "genre"} for name in missing],
+            on_conflict="name"
+        ).execute()
+        new_genres.update({genre["name"]: genre["id"] for genre in created.data})
+    
+    genre_cache.update(supabase, new_genres)
+    genre_id_by_name.update(new_genres)
+    return genre_id_by_name
 
 def process_genres(genres: List[str]) -> List[int]:
     """Process genres and return genre IDs"""
-    genre_ids = []
-    
-    for genre_name in genres:
-        # Check if genre exists
-        existing_genre = supabase.table("genres").select("id").eq("name", genre_name).execute()
-        
-        if existing_genre.data:
-            genre_ids.append(existing_genre.data[0]["id"])
-        else:
-            # Create new genre
-            new_genre = supabase.table("genres").insert({
-                "name": genre_name,
-                "category": "genre"
-            }).execute()
-            genre_ids.append(new_genre.data[0]["id"])
-    
-    return genre_ids
+    genre_id_by_name = resolve_genres_bulk(genres)
+    return [genre_id_by_name[genre_name] for genre_name in genres]
 
 def process_song_data(json_data: Dict[str, Any]) -> Dict[str, Any]:
     """Process JSON data to match our database schema"""
@@ -86,60 +163,200 @@ def process_song_data(json_data: Dict[str, Any]) -> Dict[str, Any]:
     
     return song_data
 
-def upload_song_to_supabase(song_data: Dict[str, Any], genres: List[str]) -> bool:
+def upload_songs_batch(song_infos: List[Dict[str, Any]], genre_id_by_name: Dict[str, int]) -> int:
+    """Upsert a chunk of songs and their genre links in one transactional RPC, returns number of songs stored"""
+    # See app/database/migrations/insert_songs_with_genres.sql
+    # Execute is revoked from anon/authenticated, so call it with the service role key over the pooled session
+    response = supabase.postgrest.session.post("/rpc/insert_songs_with_genres", headers=SERVICE_ROLE_HEADERS, json={
+        "songs": [song_info["song_data"] for song_info in song_infos],
+        "genre_ids": [
+            [genre_id_by_name[genre] for genre in song_info["genres"]]
+            for song_info in song_infos
+        ]
+    })
+    response.raise_for_status()
+    
+    return response.json() or 0
+
+def upload_songs_batch_with_retries(song_infos: List[Dict[str, Any]], genre_id_by_name: Dict[str, int]) -> int:
+    """Call upload_songs_batch through the shared circuit breaker, retrying transient failures.
+    Backoff and breaker settings are the ones SongUploadService uses (app/config/constants)."""
+    def attempt_upload() -> int:
+        for attempt in range(MAXIMUM_RETRIES + 1):
+            try:
+                return upload_songs_batch(song_infos, genre_id_by_name)
+            except Exception as e:
+                if attempt == MAXIMUM_RETRIES or not is_transient_error(e):
+                    raise
+                # Full jitter, so chunks that failed together during an outage don't retry in lockstep
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt))
+                logger.warning(f"Transient Supabase error, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+    
+    return breaker.call(attempt_upload)
+
+def upload_songs_bisecting(song_infos: List[Dict[str, Any]],
+                           genre_id_by_name: Dict[str, int]) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], str]]]:
+    """Upload a chunk, splitting it in halves on data errors until the bad rows are isolated.
+    Returns the songs stored and (song, error) pairs for rows that failed on their own.
+    Transient errors (after retries) and an open circuit are raised, since no row is at fault."""
+    try:
+        upload_songs_batch_with_retries(song_infos, genre_id_by_name)
+        return song_infos, []
+    except Exception as e:
+        if is_transient_error(e) or isinstance(e, CircuitOpenError):
+            raise
+        if len(song_infos) == 1:
+            return [], [(song_infos[0], str(e))]
+        logger.debug(f"Splitting {len(song_infos)} songs after error: {e}")
+    
+    mid = len(song_infos) // 2
+    stored_left, failed_left = upload_songs_bisecting(song_infos[:mid], genre_id_by_name)
+    stored_right, failed_right = upload_songs_bisecting(song_infos[mid:], genre_id_by_name)
+    return stored_left + stored_right, failed_left + failed_right
+
+async def upload_songs_concurrently(processed_songs: List[Dict[str, Any]],
+                                    genre_id_by_name: Dict[str, int]) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], str]]]:
+    """Upload all songs in BATCH_SIZE chunks with bounded concurrency.
+    Returns the songs stored and (song, error) pairs for the rows that could not be stored.
+    Chunks that hit a Supabase outage are in neither list, so the next run picks them up again."""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+    
+    async def upload_chunk(start: int) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], str]]]:
+        chunk = processed_songs[start:start + BATCH_SIZE]
+        async with semaphore:
+            # Happy path is one RPC per chunk; only data errors are narrowed down by bisection
+            try:
+                stored, failed = await asyncio.to_thread(upload_songs_bisecting, chunk, genre_id_by_name)
+            except Exception as e:
+                logger.error(f"Songs {start}-{start + len(chunk) - 1} not uploaded, Supabase unavailable: {e}")
+                return [], []
+            if failed:
+                logger.error(f"{len(failed)} songs in {start}-{start + len(chunk) - 1} failed, first error: {failed[0][1]}")
+            return stored, failed
+    
+    results = await asyncio.gather(*[upload_chunk(start) for start in range(0, len(processed_songs), BATCH_SIZE)])
+    uploaded = [song_info for stored, _ in results for song_info in stored]
+    failed = [failure for _, failures in results for failure in failures]
+    return uploaded, failed
+
+def write_failed_songs(failed: List[Tuple[Dict[str, Any], str]]) -> None:
+    """Append failed rows to FAILED_SONGS_FILE as JSON lines"""
+    FAILED_SONGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(FAILED_SONGS_FILE, "ab") as f:
+        for song_info, error in failed:
+            f.write(orjson.dumps({
+                "file_path": str(song_info["file_path"]),
+                "song_data": song_info["song_data"],
+                "genres": song_info["genres"],
+                "error": error
+            }))
+            f.write(b"\n")
+
+def upload_song_to_supabase(song_data: Dict[str, Any], genres: List[str],
+                            genre_id_by_name: Optional[Dict[str, int]] = None) -> bool:
     """Upload song data to Supabase"""
     try:
-        # Insert song
-        song_result = supabase.table("songs").insert(song_data).execute()
+        if genre_id_by_name is None:
+            genre_id_by_name = resolve_genres_bulk(genres)
         
-        if not song_result.data:
+        if not upload_songs_batch([{"song_data": song_data, "genres": genres}], genre_id_by_name):
             logger.error(f"Failed to insert song {song_data['id']}")
             return False
         
-        # Process and link genres
-        if genres:
-            genre_ids = process_genres(genres)
-            
-            # Create song-genre relationships
-            song_genres = [{"song_id": song_data["id"], "genre_id": genre_id} for genre_id in genre_ids]
-            supabase.table("song_genres").insert(song_genres).execute()
-        
         return True
         
     except Exception as e:
         logger.error(f"Error uploading song {song_data['id']}: {e}")
         return False
 
-def process_json_files(json_folder: str) -> List[Dict[str, Any]]:
-    """Process all JSON files in the folder"""
-    json_path = Path(json_folder)
-    json_files = list(json_path.glob("*.json"))
+def _parse_one(json_file: str) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+    """Read and shape one metadata file (top-level so worker processes can pickle it)"""
+    try:
+        data = read_metadata(Path(json_file))
+        return json_file, {
+            "song_data": process_song_data(data),
+            "genres": list(dict.fromkeys(data.get("tags", []))),  # Keep reading from "tags" field, deduped in order
+            "file_path": Path(json_file)
+        }, None
+    except Exception as e:
+        return json_file, None, str(e)
+
+def process_json_files(json_folder: str, manifest: Optional[UploadManifest] = None) -> Tuple[List[Dict[str, Any]], Set[str]]:
+    """Process all JSON files in the folder, skipping files the manifest marks as unchanged.
+    Returns the processed songs and the distinct genres across all of them."""
+    # Stream paths from the directory walk straight into the pool, parsing starts before the walk ends
+    json_files = Path(json_folder).glob("*.json")
+    if manifest is not None:
+        json_files = manifest.filter_changed(json_files)
     
     processed_songs = []
+    all_genres: Set[str] = set()
+    
+    # Decode + shape on every core; chunksize amortizes IPC for small files
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = executor.map(_parse_one, map(str, json_files), chunksize=32)
+        for json_file, song_info, error in tqdm(results, desc="Processing JSON files", unit="files"):
+            if error is not None:
+                logger.error(f"Error processing {json_file}: {error}")
+                continue
+            processed_songs.append(song_info)
+            all_genres.update(song_info["genres"])
     
-    for json_file in tqdm(json_files, desc="Processing JSON files"):
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Process song data
-            song_data = process_song_data(data)
-            genres = data.get("tags", [])  # Keep reading from "tags" field but rename variable
-            
-            processed_songs.append({
-                "song_data": song_data,
-                "genres": genres,
-                "file_path": json_file
-            })
-            
-        except Exception as e:
-            logger.error(f"Error processing {json_file}: {e}")
-            continue
-    
-    return processed_songs
+    return processed_songs, all_genres
+
+def upload_song_media(b2_client: B2Client, b2_keys: B2KeyCache, song_id: str) -> int:
+    """Upload a song's audio and thumbnail to B2 if missing there, returns number of files uploaded"""
+    uploaded = 0
+    
+    audio_path = Config.AUDIO_FOLDER / f"{song_id}.mp3"
+    if audio_path.exists():
+        uploaded += b2_keys.ensure_uploaded(
+            b2_client, b2_client.audio_folder, f"{song_id}.mp3",
+            lambda: b2_client.upload_audio(str(audio_path), f"{song_id}.mp3")
+        )
+    
+    # Thumbnails are stored locally as WebP and served as PNG
+    thumbnail_path = Config.THUMBNAIL_FOLDER / f"{song_id}.webp"
+    if thumbnail_path.exists():
+        def upload_thumbnail():
+            with Image.open(thumbnail_path) as img:
+                png_data = io.BytesIO()
+                img.save(png_data, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+            b2_client.upload_thumbnail_data(png_data.getvalue(), f"{song_id}.png")
+        
+        uploaded += b2_keys.ensure_uploaded(
+            b2_client, b2_client.thumbnail_folder, f"{song_id}.png", upload_thumbnail
+        )
+    
+    return uploaded
+
+def upload_media_to_b2(song_ids: List[str]) -> Tuple[int, Set[str]]:
+    """Upload media for the given songs, skipping keys already known to be in B2.
+    Returns the number of files uploaded and the ids of songs whose media uploads all succeeded."""
+    b2_client = B2Client()
+    b2_keys = B2KeyCache()
+    uploaded = 0
+    succeeded: Set[str] = set()
+    
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_MEDIA_UPLOADS) as executor:
+        futures = {executor.submit(upload_song_media, b2_client, b2_keys, song_id): song_id for song_id in song_ids}
+        for future in tqdm(futures, desc="Uploading media to B2"):
+            try:
+                uploaded += future.result()
+                succeeded.add(futures[future])
+            except Exception as e:
+                logger.error(f"Error uploading media for song {futures[future]}: {e}")
+    
+    return uploaded, succeeded
 
 def main():
     """Main upload function"""
+    # insert_songs_with_genres is revoked from the anon key; without this every RPC would fail with 401
+    if not Config.SUPABASE_SERVICE_ROLE_KEY:
+        logger.error("SUPABASE_SERVICE_ROLE_KEY not configured")
+        sys.exit(1)
+    
     json_folder = r"G:\Github\audio-foundation\database\dataset_mp3_metadata_llm\new_files"
     
     if not os.path.exists(json_folder):
@@ -148,21 +365,42 @@ def main():
     
     logger.info(f"Processing JSON files from: {json_folder}")
     
-    # Process all JSON files
-    processed_songs = process_json_files(json_folder)
+    # Process new/changed JSON files (--force re-reads everything)
+    manifest = UploadManifest()
+    processed_songs, all_genres = process_json_files(json_folder, manifest=None if "--force" in sys.argv else manifest)
     
     logger.info(f"Found {len(processed_songs)} songs to upload")
     
-    # Upload to Supabase
-    success_count = 0
-    for song_info in tqdm(processed_songs, desc="Uploading to Supabase"):
-        if upload_song_to_supabase(song_info["song_data"], song_info["genres"]):
-            success_count += 1
+    # Resolve every distinct genre in the run once
+    genre_id_by_name = resolve_genres_bulk(all_genres)
+    genre_cache.save(supabase)
+    
+    # Upload to Supabase in concurrent chunks
+    uploaded_songs, failed_songs = asyncio.run(upload_songs_concurrently(processed_songs, genre_id_by_name))
+    
+    logger.info(f"Successfully uploaded {len(uploaded_songs)}/{len(processed_songs)} songs")
+    not_attempted = len(processed_songs) - len(uploaded_songs) - len(failed_songs)
+    if not_attempted:
+        logger.warning(f"{not_attempted} songs were not uploaded because Supabase was unavailable and will be retried next run")
+    if failed_songs:
+        write_failed_songs(failed_songs)
+        logger.warning(f"Wrote {len(failed_songs)} failed songs to {FAILED_SONGS_FILE}")
+    
+    # Upload files to B2 (already-present objects are skipped)
+    media_count, media_done = upload_media_to_b2([song_info["song_data"]["id"] for song_info in uploaded_songs])
+    logger.info(f"Uploaded {media_count} media files to B2")
     
-    logger.info(f"Successfully uploaded {success_count}/{len(processed_songs)} songs")
+    # Only mark files done once their row and media are both stored, so failed media is retried next run
+    manifest.record(
+        (song_info["file_path"], song_info["song_data"]["id"])
+        for song_info in uploaded_songs
+        if song_info["song_data"]["id"] in media_done
+    )
+    if len(media_done) < len(uploaded_songs):
+        logger.warning(f"{len(uploaded_songs) - len(media_done)} songs had media upload errors and will be retried next run")
     
-    # TODO: Upload files to B2 and update URLs
-    logger.info("TODO: Upload files to B2 and update storage URLs")
+    # TODO: Update storage URLs
+    logger.info("TODO: Update storage URLs")
 
 if __name__ == "__main__":
     main()
@@ -5,6 +5,7 @@ Supports both single song and batch uploads with progress tracking.
 """
 
 import argparse
+import itertools
 import sys
 from pathlib import Path
 from typing import List, Optional
@@ -18,6 +19,7 @@ load_dotenv(Path(__file__).parent.parent / '.env')
 
 from app.services.upload_service import SongUploadService
 from app.config.logging_global import get_logger
+from app.utils.helpers import iter_files
 
 logger = get_logger(__name__)
 
@@ -32,12 +34,12 @@ def upload_single_song(metadata_file: Path) -> bool:
     Returns:
         True if successful, False otherwise
     """
-    import json
+    import orjson
     
     try:
         # Read the metadata file
-        with open(metadata_file, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
+        with open(metadata_file, 'rb') as f:
+            metadata = orjson.loads(f.read())
         
         # Upload the song
         upload_service = SongUploadService()
@@ -69,18 +71,18 @@ def upload_batch_songs(metadata_dir: str, batch_size: int = 50, limit: Optional[
         True if successful, False otherwise
     """
     try:
-        # Get list of JSON files
-        metadata_path = Path(metadata_dir)
-        json_files = list(metadata_path.glob("**/*.json"))
+        # Walk lazily; files are uploaded while the walk is still running
+        json_files = iter_files(Path(metadata_dir), ".json")
         
         if limit:
-            json_files = json_files[:limit]
+            json_files = itertools.islice(json_files, limit)
         
-        if not json_files:
+        first_file = next(json_files, None)
+        if first_file is None:
             logger.warning(f"No JSON files found in {metadata_dir}")
             return False
         
-        logger.info(f"Found {len(json_files)} JSON files to process")
+        json_files = itertools.chain([first_file], json_files)
         
         # Upload the songs
         upload_service = SongUploadService()
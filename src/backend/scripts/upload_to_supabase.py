@@ -5,6 +5,7 @@ This script maintains backward compatibility while using the new SongUploadServi
 """
 
 import argparse
+import itertools
 import time
 from pathlib import Path
 from typing import Dict, List, Any, Optional
@@ -19,7 +20,9 @@ import sys
 sys.path.append(str(Path(__file__).parent.parent))
 from app.config.logging_global import get_logger
 from app.config.simple_config import Config as config
-from app.services.upload_service import SongUploadService
+from app.utils.helpers import iter_files
+# Supabase/httpx-backed modules are imported where they are used, so --help and
+# the offline modes start without loading the network stack
 
 logger = get_logger(__name__)
 
@@ -42,8 +45,8 @@ def upload_metadata_to_supabase(
         metadata_dir: Directory containing metadata JSON files
         base_dir: Base directory for media files (optional, ignored)
         b2_bucket_name: Backblaze B2 bucket name (optional, ignored)
-        incremental: Only process new or changed files (ignored for now)
-        force: Force processing of all files regardless of history (ignored for now)
+        incremental: Only process new or changed files, per the local upload manifest
+        force: Force processing of all files regardless of history
         batch_size: Number of records to batch in a single request
         enable_versioning: Whether to save versioned copies (ignored for now)
         skip_media_check: Skip checking if media files exist (ignored for now)
@@ -52,16 +55,19 @@ def upload_metadata_to_supabase(
     Returns:
         Statistics about the upload process
     """
+    from app.services.upload_service import SongUploadService
+    from app.services.upload_manifest import UploadManifest
+    
     logger.info(f"Starting metadata upload process")
     logger.info(f"Metadata directory: {metadata_dir}")
     logger.info(f"Batch size: {batch_size}")
     logger.info(f"Using new modular upload service")
     
-    # Get list of JSON files
-    metadata_path = Path(metadata_dir)
-    json_files = list(metadata_path.glob("**/*.json"))
+    # Walk lazily; files are uploaded while the walk is still running
+    json_files = iter_files(Path(metadata_dir), ".json")
     
-    if not json_files:
+    first_file = next(json_files, None)
+    if first_file is None:
         logger.warning(f"No JSON files found in {metadata_dir}")
         return {
             "total_files": 0,
@@ -73,11 +79,22 @@ def upload_metadata_to_supabase(
             "batch_count": 0,
         }
     
-    logger.info(f"Found {len(json_files)} JSON files to process")
+    json_files = itertools.chain([first_file], json_files)
+    
+    # Drop files whose mtime/size match their last successful upload
+    manifest = UploadManifest()
+    if incremental and not force:
+        json_files = manifest.filter_changed(json_files)
     
     # Use the new upload service
     upload_service = SongUploadService()
-    stats = upload_service.upload_batch_songs(json_files, batch_size, show_progress=True)
+    try:
+        stats = upload_service.upload_batch_songs(json_files, batch_size, show_progress=True)
+    finally:
+        # One manifest write per run; also on Ctrl-C/errors, so an interrupted run keeps its progress
+        manifest.record(upload_service.uploaded_files)
+    stats["total_files"] += manifest.skipped
+    stats["skipped_unchanged"] += manifest.skipped
     
     # Print statistics
     upload_service.print_stats()
@@ -186,7 +203,7 @@ def main():
     logger.info(f"--------------------------------\n")
     
     # Upload metadata
-    start_time = time.time()
+    start_time = time.perf_counter()
     stats = upload_metadata_to_supabase(
         str(metadata_dir),
         args.base_dir,
@@ -198,7 +215,7 @@ def main():
         args.skip_media_check,
         args.force_url_updates
     )
-    end_time = time.time()
+    end_time = time.perf_counter()
     elapsed_time = end_time - start_time
     
     # Print statistics
@@ -26,9 +26,16 @@ def main():
     
     # Performance optimizations
     # For I/O-bound apps: (CPU cores * 2) is optimal
-    # Local: i7-12700 has 24 logical processors, so 48 workers max, but we test on prod
-    # Railway: typically 1-2 cores, but we can go for 4-8 workers
-    workers = 4 if is_production else 4
+    # Local: scale with the machine (i7-12700 has 24 logical processors)
+    # Railway: typically 1-2 cores, so cap at 4 to avoid oversubscribing
+    # VIBIFY_WORKERS overrides both
+    cpu_count = os.cpu_count() or 1
+    if os.environ.get("VIBIFY_WORKERS"):
+        workers = int(os.environ["VIBIFY_WORKERS"])
+    elif is_production:
+        workers = min(4, cpu_count * 2 + 1)
+    else:
+        workers = max(2, cpu_count * 2)
     
     uvicorn.run(
         "app.main:app",
@@ -36,6 +43,8 @@ def main():
         port=port,
         log_level="info",
         http="httptools",
+        loop="uvloop" if sys.platform != "win32" else "asyncio",  # uvloop has no Windows build
+        backlog=2048,
         workers=workers,
         access_log=not is_production
     )
@@ -3,106 +3,200 @@
 Test script to verify performance optimizations are working
 """
 
-import requests
+import argparse
+import asyncio
+import statistics
 import time
-import json
+from typing import Any, Dict, List, Optional, Tuple
 
-def test_api_performance():
+import httpx
+
+BASE_URL = "http://127.0.0.1:8000"
+
+# Test endpoints; {cursor} / {cursors} are filled per sample so paged requests don't all hit the same page
+ENDPOINTS = [
+    ("/health", "Health check"),
+    ("/api/songs/random?limit=5", "Random songs"),
+    ("/api/songs/discover?limit=10", "Discover feed"),
+    ("/api/songs/discover?limit=48&cursor={cursor}", "Discover feed (scrolling)"),
+    ("/api/songs/discover/batch?limit=48&cursors={cursors}", "Discover feed (3 pages, batched)"),
+    ("/api/songs/popular?limit=5", "Popular songs"),
+]
+PAGE_SIZE = 48
+BATCH_PAGES = 3
+
+# Requests per endpoint (enough samples for a meaningful p99)
+DEFAULT_SAMPLES = 200
+
+
+class TokenBucket:
+    """Async token bucket limiting request starts to `rate` per second"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def format_endpoint(endpoint: str, cursor: int) -> str:
+    """Fill the cursor placeholders; batched endpoints get BATCH_PAGES consecutive page cursors"""
+    cursors = ",".join(str(cursor + page * PAGE_SIZE) for page in range(BATCH_PAGES))
+    return endpoint.format(cursor=cursor, cursors=cursors)
+
+
+async def fetch(client: httpx.AsyncClient, semaphore: asyncio.Semaphore,
+                bucket: Optional[TokenBucket], endpoint: str, cursor: int = 0) -> Dict[str, Any]:
+    """Time one request, capped by the semaphore (and the rate limiter in --qps mode)"""
+    if bucket is not None:
+        await bucket.acquire()
+    async with semaphore:
+        # Only headers and size are reported, so drain the body chunk by chunk instead of buffering it
+        async with client.stream("GET", f"{BASE_URL}{format_endpoint(endpoint, cursor)}") as response:
+            size = 0
+            async for chunk in response.aiter_raw():
+                size += len(chunk)
+    return {
+        'total_time': response.elapsed.total_seconds(),
+        'process_time': float(response.headers.get('X-Process-Time', 0)),
+        'page_time': float(response.headers.get('X-Process-Time-Per-Page', 0)),
+        'bytes': size,
+        'status': response.status_code
+    }
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max of a latency sample"""
+    if len(values) < 2:
+        return {'p50': values[0], 'p95': values[0], 'p99': values[0], 'max': values[0]}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98], 'max': max(values)}
+
+
+async def run(n_concurrent: int = 16, qps: Optional[float] = None,
+              n_samples: int = DEFAULT_SAMPLES) -> Tuple[Dict[str, List[Any]], float]:
+    """Fire every endpoint x sample request concurrently, returns samples per endpoint and wall time"""
+    semaphore = asyncio.Semaphore(n_concurrent)
+    bucket = TokenBucket(qps) if qps else None
+
+    # HTTP/2 is negotiated via ALPN on https deployments; plain http falls back to pooled HTTP/1.1
+    async with httpx.AsyncClient(http2=True, timeout=10, limits=httpx.Limits(max_connections=64)) as client:
+        # Warm-up: open pooled connections (and server caches) outside the measurement
+        await asyncio.gather(
+            *[client.get(f"{BASE_URL}{format_endpoint(endpoint, 0)}") for endpoint, _ in ENDPOINTS],
+            return_exceptions=True
+        )
+
+        start_time = time.perf_counter()
+        tasks = [
+            fetch(client, semaphore, bucket, endpoint, cursor=i * PAGE_SIZE * BATCH_PAGES)
+            for endpoint, _ in ENDPOINTS
+            for i in range(n_samples)
+        ]
+        samples = await asyncio.gather(*tasks, return_exceptions=True)
+        wall_time = time.perf_counter() - start_time
+
+    # gather keeps task order, so each endpoint owns a consecutive slice
+    return {
+        endpoint: samples[i * n_samples:(i + 1) * n_samples]
+        for i, (endpoint, _) in enumerate(ENDPOINTS)
+    }, wall_time
+
+
+def test_api_performance(n_concurrent: int = 16, qps: Optional[float] = None,
+                         n_samples: int = DEFAULT_SAMPLES):
     """Test API performance with optimized settings"""
-    
-    base_url = "http://127.0.0.1:8000"
-    
+
     print("🚀 Testing Vibify API Performance Optimizations")
     print("=" * 50)
-    
-    # Test endpoints
-    endpoints = [
-        ("/health", "Health check"),
-        ("/api/songs/random?limit=5", "Random songs"),
-        ("/api/songs/discover?limit=10", "Discover feed"),
-        ("/api/songs/popular?limit=5", "Popular songs"),
-    ]
-    
+    print(f"Samples per endpoint: {n_samples}, concurrency: {n_concurrent}"
+          + (f", rate limit: {qps} req/s" if qps else ""))
+
+    samples_by_endpoint, wall_time = asyncio.run(run(n_concurrent, qps, n_samples))
+
     results = []
-    
-    for endpoint, description in endpoints:
-        url = f"{base_url}{endpoint}"
-        
+
+    for endpoint, description in ENDPOINTS:
         print(f"\n📊 Testing: {description}")
-        print(f"URL: {url}")
-        
-        try:
-            # Test multiple requests to see caching effects
-            times = []
-            for i in range(3):
-                start_time = time.time()
-                response = requests.get(url, timeout=10)
-                end_time = time.time()
-                
-                process_time = float(response.headers.get('X-Process-Time', 0))
-                total_time = end_time - start_time
-                
-                times.append({
-                    'request': i + 1,
-                    'total_time': total_time,
-                    'process_time': process_time,
-                    'status': response.status_code
-                })
-                
-                print(f"  Request {i+1}: {total_time:.3f}s total, {process_time:.3f}s process")
-            
-            # Calculate averages
-            avg_total = sum(t['total_time'] for t in times) / len(times)
-            avg_process = sum(t['process_time'] for t in times) / len(times)
-            
-            results.append({
-                'endpoint': endpoint,
-                'description': description,
-                'avg_total_time': avg_total,
-                'avg_process_time': avg_process,
-                'status': times[0]['status'],
-                'success': times[0]['status'] == 200
-            })
-            
-            print(f"  ✅ Average: {avg_total:.3f}s total, {avg_process:.3f}s process")
-            
-        except requests.exceptions.RequestException as e:
-            print(f"  ❌ Error: {e}")
+        print(f"URL: {BASE_URL}{format_endpoint(endpoint, 0)}")
+
+        samples = samples_by_endpoint[endpoint]
+        errors = [s for s in samples if isinstance(s, Exception)]
+        times = [s for s in samples if not isinstance(s, Exception)]
+
+        if errors:
+            print(f"  ❌ {len(errors)} errors, first: {errors[0]}")
+
+        if not times:
             results.append({
                 'endpoint': endpoint,
                 'description': description,
-                'error': str(e),
+                'error': str(errors[0]),
                 'success': False
             })
-    
+            continue
+
+        # Tail latency, not averages
+        total = percentiles([t['total_time'] for t in times])
+        process = percentiles([t['process_time'] for t in times])
+
+        results.append({
+            'endpoint': endpoint,
+            'description': description,
+            'total_time': total,
+            'process_time': process,
+            'status': times[0]['status'],
+            'success': all(t['status'] == 200 for t in times)
+        })
+
+        print(f"  ✅ total:   p50={total['p50']:.3f}s  p95={total['p95']:.3f}s  p99={total['p99']:.3f}s  max={total['max']:.3f}s")
+        print(f"     process: p50={process['p50']:.3f}s  p95={process['p95']:.3f}s  p99={process['p99']:.3f}s  max={process['max']:.3f}s")
+        if any(t['page_time'] for t in times):
+            page = percentiles([t['page_time'] for t in times])
+            print(f"     per page: p50={page['p50']:.3f}s  p95={page['p95']:.3f}s  p99={page['p99']:.3f}s  max={page['max']:.3f}s")
+        print(f"     body:    {statistics.median(t['bytes'] for t in times) / 1024:.1f} KB median (wire size)")
+
     # Summary
     print("\n" + "=" * 50)
     print("📈 PERFORMANCE SUMMARY")
     print("=" * 50)
-    
+
     successful_tests = [r for r in results if r.get('success', False)]
-    
+
     if successful_tests:
-        avg_total = sum(r['avg_total_time'] for r in successful_tests) / len(successful_tests)
-        avg_process = sum(r['avg_process_time'] for r in successful_tests) / len(successful_tests)
-        
+        # Judge on the slowest endpoint's p95
+        worst_p95 = max(r['total_time']['p95'] for r in successful_tests)
+        worst_p99 = max(r['total_time']['p99'] for r in successful_tests)
+        total_requests = len(ENDPOINTS) * n_samples
+
         print(f"✅ Successful tests: {len(successful_tests)}/{len(results)}")
-        print(f"⚡ Average response time: {avg_total:.3f}s")
-        print(f"⚡ Average process time: {avg_process:.3f}s")
-        
+        print(f"⚡ Worst endpoint p95: {worst_p95:.3f}s, p99: {worst_p99:.3f}s")
+        print(f"⚡ Throughput: {total_requests / wall_time:.1f} req/s ({total_requests} requests in {wall_time:.2f}s)")
+
         # Performance assessment
-        if avg_total < 0.3:
+        if worst_p95 < 0.3:
             print("🎉 EXCELLENT: Sub-300ms responses (TikTok-like speed)")
-        elif avg_total < 0.5:
+        elif worst_p95 < 0.5:
             print("✅ GOOD: Sub-500ms responses")
-        elif avg_total < 1.0:
+        elif worst_p95 < 1.0:
             print("⚠️  ACCEPTABLE: Sub-1s responses")
         else:
             print("❌ SLOW: Over 1s responses - needs optimization")
-            
+
     else:
         print("❌ No successful tests - check if server is running")
-    
+
     print("\n🔧 Optimizations Applied:")
     print("  ✅ Uvicorn with httptools parser")
     print("  ✅ 127.0.0.1 instead of localhost")
@@ -112,4 +206,12 @@ def test_api_performance():
     print("  ✅ Frontend deduplication")
 
 if __name__ == "__main__":
-    test_api_performance()
+    parser = argparse.ArgumentParser(description="Benchmark the Vibify API under concurrent load")
+    parser.add_argument("--base-url", default=BASE_URL, help=f"Server to benchmark (default: {BASE_URL})")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once (default: 16)")
+    parser.add_argument("--qps", type=float, help="Sustained-load mode: cap request starts per second")
+    parser.add_argument("--n", type=int, default=DEFAULT_SAMPLES, help=f"Requests per endpoint (default: {DEFAULT_SAMPLES})")
+    args = parser.parse_args()
+    BASE_URL = args.base_url.rstrip("/")
+
+    test_api_performance(n_concurrent=args.concurrency, qps=args.qps, n_samples=args.n)
@@ -47,3 +47,9 @@ def test_validate_song_files(client: TestClient, test_env_vars):
     assert "audio_exists" in data
     assert "thumbnail_exists" in data
     assert "all_files_exist" in data
+
+def test_discover_batch_rejects_bad_cursors(client: TestClient):
+    """Test that the discover batch endpoint validates its cursors"""
+    assert client.get("/api/songs/discover/batch?cursors=a,b").status_code == 400
+    assert client.get("/api/songs/discover/batch?cursors=0,48,96,144,192,240").status_code == 400
+    assert client.get("/api/songs/discover/batch?cursors=0,100000").status_code == 400
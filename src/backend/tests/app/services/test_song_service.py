@@ -5,10 +5,10 @@ Tests for song service
 import pytest
 from app.services.song_service import SongService
 
-def test_song_service_initialization():
+def test_song_service_initialization(song_service):
     """Test song service initialization"""
-    service = SongService()
-    assert service is not None
+    assert song_service is not None
+    assert SongService() is song_service
 
 def test_generate_song_urls():
     """Test generating song URLs"""
@@ -29,3 +29,28 @@ def test_validate_file_exists():
     """Test file existence validation"""
     # TODO: Implement file validation test
     pass
+
+def test_public_song_count_is_cached():
+    """Test that the public song count is queried once until invalidated"""
+    calls = []
+
+    class FakeQuery:
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: self
+
+        def execute(self):
+            calls.append(1)
+            return type("Response", (), {"count": 42})()
+
+    # Bypass the singleton so no Supabase/B2 connection is needed
+    song_service = object.__new__(SongService)
+    song_service.supabase = type("FakeSupabase", (), {"table": lambda self, name: FakeQuery()})()
+    song_service.invalidate_song_count()
+
+    assert song_service.get_public_song_count() == 42
+    assert song_service.get_public_song_count() == 42
+    assert len(calls) == 1
+
+    song_service.invalidate_song_count()
+    assert song_service.get_public_song_count() == 42
+    assert len(calls) == 2
@@ -0,0 +1,41 @@
+"""
+Tests for upload manifest
+"""
+
+import os
+import pytest
+from app.services.upload_manifest import UploadManifest
+
+def test_unchanged_files_are_skipped(tmp_path):
+    """Test that recorded files are skipped until they change"""
+    metadata_file = tmp_path / "000001.json"
+    metadata_file.write_text('{"id": "000001"}')
+
+    manifest = UploadManifest(tmp_path / "manifest.sqlite3")
+    assert list(manifest.filter_changed([metadata_file])) == [metadata_file]
+
+    manifest.record([(metadata_file, "000001")])
+    assert list(manifest.filter_changed([metadata_file])) == []
+
+    # Survives a reopen
+    assert list(UploadManifest(tmp_path / "manifest.sqlite3").filter_changed([metadata_file])) == []
+
+    # Touching the file makes it eligible again
+    stat_result = metadata_file.stat()
+    os.utime(metadata_file, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000_000))
+    assert list(manifest.filter_changed([metadata_file])) == [metadata_file]
+
+
+def test_record_uses_stat_seen_by_filter(tmp_path):
+    """Test that a file edited during the upload is still treated as changed"""
+    metadata_file = tmp_path / "000001.json"
+    metadata_file.write_text('{"id": "000001"}')
+
+    manifest = UploadManifest(tmp_path / "manifest.sqlite3")
+    assert list(manifest.filter_changed([metadata_file])) == [metadata_file]
+
+    # Edited after it was read but before the upload was recorded
+    metadata_file.write_text('{"id": "000001", "title": "edited"}')
+    manifest.record([(metadata_file, "000001")])
+
+    assert list(manifest.filter_changed([metadata_file])) == [metadata_file]
@@ -3,13 +3,18 @@ Tests for B2 client utility - Focus on behavior, not implementation
 """
 
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
+
+pytest.importorskip("botocore")
+
+import boto3
 from botocore.exceptions import ClientError
-from app.utils.b2_client import B2Client
+from botocore.stub import Stubber
+from app.utils.b2_client import B2Client, S3_CLIENT_CONFIG
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def mock_config():
-    """Mock the Config class for testing"""
+    """Mock the Config class for testing (values never change, so patch once per module)"""
     with patch('app.config.simple_config.Config') as mock_config:
         mock_config.B2_KEY_ID = "test_key_id"
         mock_config.B2_APPLICATION_KEY = "test_app_key"
@@ -20,174 +25,219 @@ def mock_config():
         mock_config.B2_THUMBNAIL_FOLDER = "thumbnails"
         yield mock_config
 
-def test_b2_client_initialization(mock_config):
+@pytest.fixture(scope="module")
+def real_s3_client():
+    """A real (offline) S3 client, built once, for request-level stubbing"""
+    return boto3.client(
+        's3',
+        endpoint_url="https://test.endpoint.com",
+        aws_access_key_id="test_key_id",
+        aws_secret_access_key="test_app_key",
+        region_name="us-east-1",
+        config=S3_CLIENT_CONFIG
+    )
+
+@pytest.fixture
+def s3_stubber(real_s3_client, monkeypatch):
+    """Stubber over the real client: validates request parameters, returns queued responses"""
+    monkeypatch.setattr('app.utils.b2_client._S3_CLIENT', real_s3_client)
+    with Stubber(real_s3_client) as stubber:
+        yield stubber
+        stubber.assert_no_pending_responses()
+
+# Prebuilt S3 errors raised by the MagicMock-based tests
+_NO_SUCH_BUCKET = ClientError({'Error': {'Code': 'NoSuchBucket', 'Message': 'Bucket not found'}}, 'UploadFile')
+_NOT_FOUND = ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+
+AUTH_RESPONSE = {
+    "authorizationToken": "test_token",
+    "downloadUrl": "https://f000.test.com",
+    "allowed": {"bucketName": "test-bucket", "bucketId": "test_bucket_id"}
+}
+
+@pytest.fixture(scope="module")
+def b2_client(mock_config):
+    """One B2Client per module, built from the mocked config with a canned authorization"""
+    from app.utils import b2_client as b2_client_module
+    
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(B2Client, "_instance", None)
+        mp.setattr(b2_client_module, "_AUTH_CACHE", {})
+        mp.setattr(B2Client, "_authorize_account", lambda self: AUTH_RESPONSE)
+        yield B2Client()
+
+def test_b2_client_initialization(b2_client):
     """Test B2 client initializes with correct config values"""
-    client = B2Client()
-    assert client.audio_folder == "audio"
-    assert client.thumbnail_folder == "thumbnails"
-    assert client.bucket_name == "test-bucket"
-    assert client.endpoint_url == "https://test.endpoint.com"
-    assert client.api_url == "https://api.test.com"
-
-def test_get_audio_url_returns_valid_url(mock_config):
-    """Test audio URL generation returns a valid presigned URL"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_s3_client.generate_presigned_url.return_value = "https://test.com/audio/0000000.mp3?signature=test"
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        url = client.get_audio_url("0000000.mp3")
-        
-        # Test behavior: URL should be valid and contain expected elements
-        assert url.startswith("https://")
-        assert "audio/0000000.mp3" in url
-        assert "signature=" in url  # Presigned URL should have signature
-
-def test_get_thumbnail_url_returns_valid_url(mock_config):
-    """Test thumbnail URL generation returns a valid presigned URL"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_s3_client.generate_presigned_url.return_value = "https://test.com/thumbnails/0000000.png?signature=test"
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        url = client.get_thumbnail_url("0000000.png")
-        
-        # Test behavior: URL should be valid and contain expected elements
-        assert url.startswith("https://")
-        assert "thumbnails/0000000.png" in url
-        assert "signature=" in url  # Presigned URL should have signature
-
-def test_get_audio_url_handles_folder_prefix(mock_config):
-    """Test audio URL generation strips folder prefix correctly"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_s3_client.generate_presigned_url.return_value = "https://test.com/audio/0000000.mp3?signature=test"
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        url = client.get_audio_url("audio/0000000.mp3")
-        
-        # Test behavior: Should work with prefixed filename
-        assert "audio/0000000.mp3" in url
-
-def test_get_thumbnail_url_handles_folder_prefix(mock_config):
-    """Test thumbnail URL generation strips folder prefix correctly"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_s3_client.generate_presigned_url.return_value = "https://test.com/thumbnails/0000000.png?signature=test"
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        url = client.get_thumbnail_url("thumbnails/0000000.png")
-        
-        # Test behavior: Should work with prefixed filename
-        assert "thumbnails/0000000.png" in url
-
-def test_get_audio_url_handles_empty_filename(mock_config):
-    """Test audio URL generation handles empty filename gracefully"""
-    client = B2Client()
-    url = client.get_audio_url("")
-    assert url == ""
-
-def test_get_thumbnail_url_handles_empty_filename(mock_config):
-    """Test thumbnail URL generation handles empty filename gracefully"""
-    client = B2Client()
-    url = client.get_thumbnail_url("")
-    assert url == ""
-
-def test_upload_audio_succeeds(mock_config):
+    assert b2_client.audio_folder == "audio"
+    assert b2_client.thumbnail_folder == "thumbnails"
+    assert b2_client.bucket_name == "test-bucket"
+    assert b2_client.endpoint_url == "https://test.endpoint.com"
+    assert b2_client.api_url == "https://api.test.com"
+
+@pytest.mark.parametrize("getter,folder,filename", [
+    ("get_audio_url", "audio", "0000000.mp3"),
+    ("get_thumbnail_url", "thumbnails", "0000000.png"),
+    ("get_audio_url", "audio", "audio/0000000.mp3"),  # Folder prefix is stripped
+    ("get_thumbnail_url", "thumbnails", "thumbnails/0000000.png"),
+])
+def test_get_url_returns_valid_url(b2_client, getter, folder, filename):
+    """Test audio/thumbnail URL generation returns a valid authorized URL, with or without folder prefix"""
+    url = getattr(b2_client, getter)(filename)
+    
+    # Test behavior: URL should be valid and contain expected elements
+    assert url.startswith("https://")
+    assert f"{folder}/{filename.rsplit('/', 1)[-1]}" in url
+    assert f"{folder}/{folder}/" not in url  # Prefix not doubled
+    assert "Authorization=" in url  # Private bucket URL should carry the auth token
+
+@pytest.mark.parametrize("getter", ["get_audio_url", "get_thumbnail_url"])
+def test_get_url_handles_empty_filename(b2_client, getter):
+    """Test URL generation returns "" for an empty filename without authenticating or building an S3 client"""
+    with patch.object(B2Client, '_ensure_authenticated', return_value=True) as mock_authenticate, \
+         patch('app.utils.b2_client.boto3.client') as mock_boto3:
+        url = getattr(b2_client, getter)("")
+        
+        assert url == ""
+        assert mock_authenticate.call_count == 0
+        assert mock_boto3.call_count == 0
+
+def test_upload_audio_succeeds(b2_client, mock_s3):
     """Test audio file upload succeeds without errors"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        # Should not raise any exceptions
-        client.upload_audio("/path/to/file.mp3", "0000000.mp3")
-        
-        # Verify upload was attempted
-        mock_s3_client.upload_file.assert_called_once()
-
-def test_upload_thumbnail_succeeds(mock_config):
+    # Should not raise any exceptions
+    b2_client.upload_audio("/path/to/file.mp3", "0000000.mp3")
+    
+    # Verify upload was attempted, with the shared multipart transfer config
+    assert mock_s3.upload_file.call_count == 1
+    assert mock_s3.upload_file.call_args.kwargs['Config'].max_concurrency == 10
+
+def test_upload_thumbnail_succeeds(b2_client, mock_s3):
     """Test thumbnail file upload succeeds without errors"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        # Should not raise any exceptions
-        client.upload_thumbnail("/path/to/file.png", "0000000.png")
-        
-        # Verify upload was attempted
-        mock_s3_client.upload_file.assert_called_once()
-
-def test_upload_audio_handles_errors(mock_config):
+    # Should not raise any exceptions
+    b2_client.upload_thumbnail("/path/to/file.png", "0000000.png")
+    
+    # Verify upload was attempted, with the shared multipart transfer config
+    assert mock_s3.upload_file.call_count == 1
+    assert mock_s3.upload_file.call_args.kwargs['Config'].max_concurrency == 10
+
+def test_upload_thumbnail_data_succeeds(b2_client, mock_s3):
+    """Test in-memory thumbnail upload goes to the thumbnail folder with its content type"""
+    b2_client.upload_thumbnail_data(b"png bytes", "0000000.png")
+    
+    assert mock_s3.upload_fileobj.call_count == 1
+    fileobj, bucket, key = mock_s3.upload_fileobj.call_args.args
+    assert fileobj.read() == b"png bytes"
+    assert key == f"{b2_client.thumbnail_folder}/0000000.png"
+    assert mock_s3.upload_fileobj.call_args.kwargs['ExtraArgs'] == {"ContentType": "image/png"}
+
+def test_upload_audio_handles_errors(b2_client, mock_s3):
     """Test audio file upload handles errors properly"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_s3_client.upload_file.side_effect = ClientError(
-            {'Error': {'Code': 'NoSuchBucket', 'Message': 'Bucket not found'}}, 'UploadFile'
-        )
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        
-        # Should raise the ClientError (not swallow it)
-        with pytest.raises(ClientError):
-            client.upload_audio("/path/to/file.mp3", "0000000.mp3")
+    mock_s3.upload_file.side_effect = _NO_SUCH_BUCKET
+    
+    # Should raise the ClientError (not swallow it)
+    with pytest.raises(ClientError):
+        b2_client.upload_audio("/path/to/file.mp3", "0000000.mp3")
 
-def test_file_exists_returns_true_when_file_exists(mock_config):
+def test_file_exists_returns_true_when_file_exists(b2_client, s3_stubber):
     """Test file existence check returns True when file exists"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_s3_client.head_object.return_value = {}  # File exists
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        exists = client.file_exists("audio", "0000000.mp3")
-        
-        assert exists is True
+    s3_stubber.add_response('head_object', {}, {'Bucket': "test-bucket", 'Key': "audio/0000000.mp3"})
+    
+    exists = b2_client.file_exists("audio", "0000000.mp3")
+    
+    assert exists is True
 
-def test_file_exists_returns_false_when_file_not_found(mock_config):
+def test_file_exists_returns_false_when_file_not_found(b2_client, s3_stubber):
     """Test file existence check returns False when file doesn't exist"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_s3_client.head_object.side_effect = ClientError(
-            {'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject'
-        )
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        exists = client.file_exists("audio", "nonexistent.mp3")
-        
-        assert exists is False
-
-def test_delete_file_succeeds(mock_config):
+    s3_stubber.add_client_error(
+        'head_object', service_error_code='404', http_status_code=404,
+        expected_params={'Bucket': "test-bucket", 'Key': "audio/nonexistent.mp3"}
+    )
+    
+    exists = b2_client.file_exists("audio", "nonexistent.mp3")
+    
+    assert exists is False
+
+def test_files_exist_lists_once_for_many_keys(b2_client, s3_stubber):
+    """Test batched existence check uses one prefix listing instead of a HEAD per key"""
+    filenames = [f"{i:07d}.mp3" for i in range(100)]
+    # Exactly one queued response: a HEAD request or second listing would fail the stubber
+    s3_stubber.add_response(
+        'list_objects_v2',
+        {'Contents': [{'Key': 'audio/0000000.mp3'}, {'Key': 'audio/0000042.mp3'}], 'IsTruncated': False},
+        {'Bucket': "test-bucket", 'Prefix': "audio/00000"}
+    )
+    
+    exists = b2_client.files_exist("audio", filenames)
+    
+    assert exists["0000000.mp3"] is True
+    assert exists["0000042.mp3"] is True
+    assert sum(exists.values()) == 2
+
+def test_files_exist_uses_head_for_few_keys(b2_client, mock_s3):
+    """Test small existence checks fall back to HEAD requests"""
+    def head_object(Bucket, Key):
+        if Key != "audio/0000000.mp3":
+            raise _NOT_FOUND
+        return {}
+    
+    mock_s3.head_object.side_effect = head_object
+    exists = b2_client.files_exist("audio", ["0000000.mp3", "0000001.mp3"])
+    
+    assert exists == {"0000000.mp3": True, "0000001.mp3": False}
+    assert mock_s3.head_object.call_count == 2
+    assert mock_s3.get_paginator.call_count == 0
+
+def test_delete_file_succeeds(b2_client, s3_stubber):
     """Test file deletion succeeds without errors"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_boto3.return_value = mock_s3_client
-        
-        client = B2Client()
-        # Should not raise any exceptions
-        client.delete_file("audio", "0000000.mp3")
-        
-        # Verify deletion was attempted
-        mock_s3_client.delete_object.assert_called_once()
+    s3_stubber.add_response('delete_object', {}, {'Bucket': "test-bucket", 'Key': "audio/0000000.mp3"})
+    
+    # Should not raise any exceptions
+    b2_client.delete_file("audio", "0000000.mp3")
 
-def test_delete_file_handles_errors(mock_config):
+def test_delete_file_handles_errors(b2_client, s3_stubber):
     """Test file deletion handles errors properly"""
-    with patch('app.utils.b2_client.boto3.client') as mock_boto3:
-        mock_s3_client = MagicMock()
-        mock_s3_client.delete_object.side_effect = ClientError(
-            {'Error': {'Code': 'NoSuchKey', 'Message': 'Key not found'}}, 'DeleteObject'
-        )
-        mock_boto3.return_value = mock_s3_client
-        
+    s3_stubber.add_client_error('delete_object', service_error_code='NoSuchKey', http_status_code=404)
+    
+    # Should raise the ClientError (not swallow it)
+    with pytest.raises(ClientError):
+        b2_client.delete_file("audio", "nonexistent.mp3")
+
+def test_authorization_is_shared_between_clients(mock_config, monkeypatch):
+    """Test a new B2Client reuses the cached authorization instead of re-authorizing"""
+    from app.utils import b2_client as b2_client_module
+    
+    monkeypatch.setattr(b2_client_module, "_AUTH_CACHE", {})
+    
+    with patch.object(B2Client, '_authorize_account', return_value=AUTH_RESPONSE) as mock_authorize:
+        monkeypatch.setattr(B2Client, "_instance", None)
+        first = B2Client()
+        monkeypatch.setattr(B2Client, "_instance", None)
+        second = B2Client()
+        
+        assert first is not second
+        assert second._auth_token == "test_token"
+        assert mock_authorize.call_count == 1
+
+def test_download_urls_follow_token_refresh(mock_config, monkeypatch):
+    """Test download URLs carry the current token and change when it is refreshed"""
+    from app.utils import b2_client as b2_client_module
+    
+    auth_responses = [
+        {
+            "authorizationToken": token,
+            "downloadUrl": "https://f000.test.com",
+            "allowed": {"bucketName": "test-bucket", "bucketId": "test_bucket_id"}
+        }
+        for token in ("first_token", "second_token")
+    ]
+    monkeypatch.setattr(b2_client_module, "_AUTH_CACHE", {})
+    monkeypatch.setattr(B2Client, "_instance", None)
+    
+    with patch.object(B2Client, '_authorize_account', side_effect=auth_responses):
         client = B2Client()
+        assert client.get_audio_url("0000000.mp3") == "https://f000.test.com/file/test-bucket/audio/0000000.mp3?Authorization=first_token"
+        assert client.get_thumbnail_url("thumbnails/0000000.png") == "https://f000.test.com/file/test-bucket/thumbnails/0000000.png?Authorization=first_token"
         
-        # Should raise the ClientError (not swallow it)
-        with pytest.raises(ClientError):
-            client.delete_file("audio", "nonexistent.mp3")
+        # Force a refresh
+        client._is_authenticated = False
+        b2_client_module._AUTH_CACHE.clear()
+        assert client.get_audio_url("0000000.mp3").endswith("?Authorization=second_token")
@@ -0,0 +1,54 @@
+"""
+Tests for circuit breaker
+"""
+
+import pytest
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN
+
+def test_circuit_opens_and_recovers(monkeypatch):
+    """Test the circuit fails fast after repeated failures and closes after a successful probe"""
+    now = [1000.0]
+    monkeypatch.setattr("app.utils.circuit_breaker.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(fail_threshold=2, reset_timeout=60)
+
+    def fail():
+        raise ConnectionError("down")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == OPEN
+
+    # Open: the function is not called at all
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: pytest.fail("called while open"))
+
+    # After the timeout one probe goes through and closes the circuit
+    now[0] += 60
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+def test_ignored_errors_do_not_trip():
+    """Test errors rejected by is_failure never open the circuit"""
+    breaker = CircuitBreaker(fail_threshold=1, is_failure=lambda e: not isinstance(e, ValueError))
+    with pytest.raises(ValueError):
+        breaker.call(int, "not a number")
+    assert breaker.state == CLOSED
+
+def test_is_transient_error():
+    """Test outages and rate limits are transient, data and auth errors are not"""
+    import httpx
+    from postgrest.exceptions import APIError
+    from app.utils.circuit_breaker import is_transient_error
+
+    def status_error(status):
+        request = httpx.Request("POST", "http://supabase/rpc/insert_songs_with_genres")
+        return httpx.HTTPStatusError("error", request=request, response=httpx.Response(status, request=request))
+
+    assert is_transient_error(httpx.ConnectError("reset"))
+    assert is_transient_error(status_error(503))
+    assert is_transient_error(status_error(429))
+    assert is_transient_error(APIError({"code": "40P01", "message": "deadlock detected"}))
+    assert not is_transient_error(status_error(400))
+    assert not is_transient_error(status_error(401))
+    assert not is_transient_error(APIError({"code": "23505", "message": "duplicate key"}))
@@ -1,15 +1,20 @@
 """
 Test environment variable loading and Supabase connection
 """
+import asyncio
 import os
+import httpx
+import pytest
 from pathlib import Path
 from app.config.simple_config import Config
 from app.database.connection import SupabaseClient
 
+# Backend root .env (tests/app/utils -> tests/app -> tests -> backend)
+_ENV_PATH = Path(__file__).resolve().parents[3] / '.env'
+
 def test_env_file_exists():
     """Test that .env file exists"""
-    env_path = Path(__file__).parent.parent.parent.parent / '.env'
-    assert env_path.exists(), f".env file not found at {env_path}"
+    assert _ENV_PATH.exists(), f".env file not found at {_ENV_PATH}"
 
 def test_env_variables_loaded():
     """Test that environment variables are loaded correctly"""
@@ -30,43 +35,56 @@ def test_env_variables_loaded():
     print(f"✅ B2_APPLICATION_KEY_ID: {Config.B2_KEY_ID}")
     print(f"✅ PYTHON_ENV: {Config.PYTHON_ENV}")
 
-def test_supabase_connection():
-    """Test that Supabase connection works"""
+@pytest.fixture(scope="module")
+def supabase():
+    """Supabase client shared by this module's tests"""
     try:
-        supabase_client = SupabaseClient()
-        supabase = supabase_client.get_client()
-        assert supabase is not None, "Supabase client is None"
-        
-        # Test a simple query
-        result = supabase.table('songs').select('id, title, artist').limit(1).execute()
-        assert result is not None, "Supabase query returned None"
-        print(f"✅ Supabase connection successful")
-        print(f"✅ Query result: {len(result.data)} songs found")
-        
+        return SupabaseClient().get_client()
     except Exception as e:
         raise AssertionError(f"Supabase connection failed: {str(e)}")
 
-def test_database_has_data():
-    """Test that database has songs"""
+async def _fetch_songs_sample():
+    """Sample rows and the exact song count, fetched concurrently over one HTTP/2 connection"""
+    headers = {
+        "apikey": Config.SUPABASE_KEY,
+        "Authorization": f"Bearer {Config.SUPABASE_KEY}",
+    }
+    songs_url = f"{Config.SUPABASE_URL}/rest/v1/songs"
+    async with httpx.AsyncClient(http2=True, headers=headers, timeout=10) as client:
+        sample, count = await asyncio.gather(
+            client.get(songs_url, params={"select": "id,title,artist", "limit": 5}),
+            client.head(songs_url, params={"select": "id"}, headers={"Prefer": "count=exact"}),
+        )
+    sample.raise_for_status()
+    count.raise_for_status()
+    # Content-Range looks like "*/1234" (or "0-4/1234")
+    return {"songs": sample.json(), "count": int(count.headers["content-range"].split("/")[-1])}
+
+@pytest.fixture(scope="module")
+def songs_sample(supabase):
+    """One round of queries whose responses both the connection and data tests check"""
     try:
-        supabase_client = SupabaseClient()
-        supabase = supabase_client.get_client()
-        result = supabase.table('songs').select('id, title, artist').limit(5).execute()
-        
-        assert len(result.data) > 0, f"Database has no songs. Found {len(result.data)} songs"
-        print(f"✅ Database has {len(result.data)} songs")
-        
-        # Print first few songs
-        for i, song in enumerate(result.data[:3]):
-            print(f"  {i+1}. {song['title']} by {song['artist']}")
-            
+        return asyncio.run(_fetch_songs_sample())
     except Exception as e:
         raise AssertionError(f"Database query failed: {str(e)}")
 
+def test_supabase_connection(supabase, songs_sample):
+    """Test that Supabase connection works"""
+    assert supabase is not None, "Supabase client is None"
+    assert songs_sample is not None, "Supabase query returned None"
+    print(f"✅ Supabase connection successful")
+    print(f"✅ Query result: {len(songs_sample['songs'])} songs found")
+
+def test_database_has_data(songs_sample):
+    """Test that database has songs"""
+    assert len(songs_sample["songs"]) > 0, f"Database has no songs. Found {len(songs_sample['songs'])} songs"
+    assert songs_sample["count"] >= len(songs_sample["songs"])
+    print(f"✅ Database has {songs_sample['count']} songs")
+    
+    # Print first few songs
+    for i, song in enumerate(songs_sample["songs"][:3]):
+        print(f"  {i+1}. {song['title']} by {song['artist']}")
+
 if __name__ == "__main__":
-    # Run tests manually
-    test_env_file_exists()
-    test_env_variables_loaded()
-    test_supabase_connection()
-    test_database_has_data()
-    print("✅ All tests passed!")
+    # Run tests manually (through pytest so the fixtures are provided)
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,15 @@
+"""
+Tests for helper utilities
+"""
+
+from app.utils.helpers import iter_files
+
+def test_iter_files_walks_nested_directories(tmp_path):
+    """Test that matching files are found at every depth and others are ignored"""
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    expected = {tmp_path / "1.json", tmp_path / "a" / "2.json", tmp_path / "a" / "b" / "3.json"}
+    for path in expected:
+        path.write_text("{}")
+    (tmp_path / "a" / "notes.txt").write_text("")
+
+    assert set(iter_files(tmp_path, ".json")) == expected
@@ -3,11 +3,70 @@ Tests for validators utility
 """
 
 import pytest
+from unittest.mock import patch
+from app.utils.validators import FileValidator, get_audio_duration, get_image_dimensions
 
-def test_audio_file_validation():
-    """Test audio file validation"""
-    # TODO: Implement audio validation test
-    pass
+def test_audio_file_validation(tmp_path):
+    """Test shallow audio validation skips the metadata probe, deep does not"""
+    audio_path = tmp_path / "0000000.mp3"
+    audio_path.write_bytes(b"not really an mp3")
+    validator = FileValidator()
+    
+    with patch('app.utils.validators.mutagen.File', return_value=None) as mock_file:
+        # Shallow mode only checks size + extension
+        assert validator.validate_audio_file(audio_path, deep=False) == (True, "")
+        mock_file.assert_not_called()
+        
+        # Deep mode (the default) reads the metadata and rejects unreadable files
+        is_valid, error = validator.validate_audio_file(audio_path)
+        assert is_valid is False
+        assert error == "Unable to read audio file metadata"
+
+def test_audio_duration_from_mp3_header(tmp_path):
+    """Test MP3 duration is derived from the frame header without mutagen"""
+    # MPEG 1 Layer III, 128 kbps, 44.1 kHz: 16000 bytes of audio is one second
+    audio_path = tmp_path / "0000000.mp3"
+    audio_path.write_bytes(b"\xff\xfb\x90\x00" + b"\x00" * 15996)
+    
+    with patch('app.utils.validators.mutagen.File') as mock_file:
+        assert get_audio_duration(audio_path) == pytest.approx(1.0)
+        mock_file.assert_not_called()
+
+def test_edited_files_are_re_read(tmp_path):
+    """Test cached file info follows edits, truncation and deletion"""
+    from PIL import Image
+    image_path = tmp_path / "0000000.png"
+    Image.new("RGB", (60, 60)).save(image_path)
+    assert get_image_dimensions(image_path) == (60, 60)
+    
+    Image.new("RGB", (80, 70)).save(image_path)
+    assert get_image_dimensions(image_path) == (80, 70)
+    
+    audio_path = tmp_path / "0000000.mp3"
+    audio_path.write_bytes(b"not really an mp3")
+    validator = FileValidator()
+    assert validator.validate_audio_file(audio_path, deep=False) == (True, "")
+    
+    audio_path.write_bytes(b"")
+    assert validator.validate_audio_file(audio_path, deep=False) == (False, "File is empty")
+    
+    audio_path.unlink()
+    assert validator.validate_audio_file(audio_path, deep=False)[0] is False
+
+def test_file_pair_validation_fails_fast(tmp_path):
+    """Test invalid audio skips image validation unless all errors are requested"""
+    audio_path = tmp_path / "0000000.mp3"
+    image_path = tmp_path / "0000000.webp"
+    validator = FileValidator()
+    
+    with patch.object(validator, 'validate_image_file', return_value=(False, "bad image")) as mock_image:
+        is_valid, errors = validator.validate_file_pair(audio_path, image_path)
+        assert is_valid is False
+        assert len(errors) == 1
+        mock_image.assert_not_called()
+        
+        is_valid, errors = validator.validate_file_pair(audio_path, image_path, fail_fast=False)
+        assert errors[1] == "Image: bad image"
 
 def test_image_file_validation():
     """Test image file validation"""
@@ -3,27 +3,77 @@ Pytest configuration and fixtures for Vibify backend tests
 """
 
 import pytest
-import os
+from unittest.mock import MagicMock
 from fastapi.testclient import TestClient
-from app.main import app
 
-@pytest.fixture
+# The app and services are imported inside their fixtures, so modules that never
+# request them (e.g. the B2 client tests) don't load the whole app at collection
+
+# Network-bound test modules; under xdist each is pinned to one worker so its module-scoped
+# fixtures (Supabase client, sample query) run once, while different modules overlap
+IO_BOUND_MODULES = ("test_env_connection", "test_b2_client")
+
+def pytest_configure(config):
+    # Registered here too so the marker is known when pytest-xdist isn't installed
+    config.addinivalue_line("markers", "xdist_group(name): run all tests of the group on one xdist worker")
+
+def pytest_collection_modifyitems(config, items):
+    for item in items:
+        module_name = item.module.__name__.rsplit(".", 1)[-1]
+        if module_name in IO_BOUND_MODULES:
+            item.add_marker(pytest.mark.xdist_group(module_name))
+
+@pytest.fixture(scope="session")
 def client():
-    """Test client fixture"""
-    return TestClient(app)
+    """Test client fixture (app startup runs once per test session)"""
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
 
 @pytest.fixture
+def isolated_client():
+    """Opt-in test client with its own app startup/shutdown, for tests that change app state"""
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def song_service():
+    """Shared SongService (authenticates to Supabase/B2 once per test session)"""
+    from app.services.song_service import SongService
+    return SongService()
+
+@pytest.fixture(scope="session")
+def upload_service():
+    """Shared SongUploadService (connects to Supabase once per test session)"""
+    from app.services.upload_service import SongUploadService
+    return SongUploadService()
+
+@pytest.fixture(scope="session")
+def s3_mock_instance():
+    """One MagicMock for the S3 client, reused (and reset) across tests"""
+    return MagicMock(name="s3")
+
+@pytest.fixture(autouse=True)
+def mock_s3(monkeypatch, s3_mock_instance):
+    """Stand-in for the shared S3 client, so no test builds or calls a real one"""
+    monkeypatch.setattr('app.utils.b2_client._S3_CLIENT', s3_mock_instance)
+    yield s3_mock_instance
+    # Drop recorded calls and configured behavior before the next test
+    s3_mock_instance.reset_mock(return_value=True, side_effect=True)
+
+@pytest.fixture(scope="module")
 def test_env_vars():
-    """Set test environment variables"""
-    os.environ["B2_KEY_ID"] = "test_key_id"
-    os.environ["B2_APPLICATION_KEY"] = "test_app_key"
-    os.environ["B2_BUCKET_NAME"] = "test-bucket"
-    os.environ["B2_ENDPOINT_URL"] = "https://test.endpoint.com"
-    os.environ["B2_AUDIO_FOLDER"] = "audio"
-    os.environ["B2_THUMBNAIL_FOLDER"] = "thumbnail"
-    yield
-    # Cleanup after test
-    for key in ["B2_KEY_ID", "B2_APPLICATION_KEY", "B2_BUCKET_NAME", 
-                "B2_ENDPOINT_URL", "B2_AUDIO_FOLDER", "B2_THUMBNAIL_FOLDER"]:
-        if key in os.environ:
-            del os.environ[key]
+    """Set test environment variables (once per module, restored afterwards)"""
+    # MonkeyPatch.context is the module/session-scoped form of the monkeypatch fixture
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in {
+            "B2_KEY_ID": "test_key_id",
+            "B2_APPLICATION_KEY": "test_app_key",
+            "B2_BUCKET_NAME": "test-bucket",
+            "B2_ENDPOINT_URL": "https://test.endpoint.com",
+            "B2_AUDIO_FOLDER": "audio",
+            "B2_THUMBNAIL_FOLDER": "thumbnail",
+        }.items():
+            mp.setenv(key, value)
+        yield